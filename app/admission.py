@@ -0,0 +1,101 @@
+import asyncio
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from app.metrics import get_route_path
+from common.metrics import ADMISSION_REJECTIONS
+
+
+class AdmissionLimit:
+    """
+    At most `max_concurrent` requests of a route run at once, `max_queue` more wait up to
+    `queue_timeout` seconds for a slot and the rest are shed with `status_code` and Retry-After.
+    With `fallback` the last good 200 response for the same URL is served instead of shedding,
+    and instead of queueing when one exists.
+    """
+
+    def __init__(self, max_concurrent, max_queue=0, queue_timeout=1, retry_after=1, status_code=503, fallback=False):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.status_code = status_code
+        self.fallback = fallback
+        self.semaphore = None
+        self.waiting = 0
+
+    async def acquire(self, queue=True):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+            return True
+        if not queue or self.waiting >= self.max_queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self.semaphore.release()
+
+
+class AdmissionControl:
+    fallback_size = 256
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.fallbacks = OrderedDict()
+
+    async def __call__(self, request: Request, call_next):
+        route = get_route_path(request)
+        limit = self.limits.get(route)
+        if limit is None:
+            return await call_next(request)
+        url = str(request.url)
+        if not await limit.acquire(queue=not (limit.fallback and url in self.fallbacks)):
+            return self.reject(route, limit, url)
+        try:
+            response = await call_next(request)
+        except BaseException:
+            limit.release()
+            raise
+        if limit.fallback and response.status_code == 200:
+            body = b''.join([chunk async for chunk in response.body_iterator])
+            limit.release()
+            self.set_fallback(url, body, response.media_type or response.headers.get('content-type'))
+            return Response(content=body, status_code=200, headers=dict(response.headers))
+        response.body_iterator = self.release_after(response.body_iterator, limit)
+        return response
+
+    async def release_after(self, body_iterator, limit):
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            limit.release()
+
+    def set_fallback(self, url, body, media_type):
+        self.fallbacks[url] = (body, media_type)
+        self.fallbacks.move_to_end(url)
+        while len(self.fallbacks) > self.fallback_size:
+            self.fallbacks.popitem(last=False)
+
+    def reject(self, route, limit, url):
+        if limit.fallback and url in self.fallbacks:
+            ADMISSION_REJECTIONS.labels(route, 'fallback').inc()
+            body, media_type = self.fallbacks[url]
+            return Response(content=body, media_type=media_type, headers={'Warning': '110 - "Response is Stale"'})
+        ADMISSION_REJECTIONS.labels(route, 'shed').inc()
+        return Response(
+            content=f'{{"detail":"{route} is overloaded, retry later"}}',
+            status_code=limit.status_code,
+            media_type='application/json',
+            headers={'Retry-After': str(limit.retry_after)},
+        )
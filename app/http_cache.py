@@ -0,0 +1,76 @@
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from services.block_index import BlockHeightIndex
+
+
+CACHE_CONTROL = {
+    '/pairs/': 'public, max-age=300',
+    '/dev/pairs/': 'public, max-age=300',
+    '/v1/wallet/assets': 'public, max-age=300',
+    '/tickers/': 'public, max-age=5',
+    '/dev/tickers/': 'public, max-age=5',
+    '/v1/spot/summary': 'public, max-age=5',
+    '/v1/dev/spot/summary': 'public, max-age=5',
+    '/v1/spot/ticker': 'public, max-age=5',
+    '/v1/dev/spot/ticker': 'public, max-age=5',
+    '/v1/spot/recent': 'public, max-age=5',
+    '/v1/spot/trades': 'public, max-age=5',
+    '/v1/24h_volume_in_usd': 'public, max-age=5',
+    '/v1/spot/candles': 'public, max-age=5',
+    '/v1/spot/stats': 'public, max-age=5',
+    '/v1/volume_in_usd': 'public, max-age=5',
+}
+
+PREFIX_CACHE_CONTROL = {
+    '/historical_trades/': 'public, max-age=5',
+}
+
+
+def get_cache_control(path):
+    if path in CACHE_CONTROL:
+        return CACHE_CONTROL[path]
+    for prefix, cache_control in PREFIX_CACHE_CONTROL.items():
+        if path.startswith(prefix):
+            return cache_control
+    return None
+
+
+def get_validators(height):
+    if not height:
+        return {}
+    headers = {'ETag': f'W/"{height}"'}
+    timestamp = BlockHeightIndex().get_timestamp(height)
+    if timestamp:
+        headers['Last-Modified'] = formatdate(timestamp, usegmt=True)
+    return headers
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or etag[len('W/'):] in tags
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(last_modified)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def conditional_cache_middleware(request: Request, call_next):
+    cache_control = get_cache_control(request.url.path)
+    if request.method not in ('GET', 'HEAD') or cache_control is None:
+        return await call_next(request)
+    response = await call_next(request)
+    if response.status_code != 200 or 'warning' in response.headers:
+        return response
+    response.headers['Cache-Control'] = cache_control
+    etag = response.headers.get('etag')
+    if etag and is_not_modified(request, etag, response.headers.get('last-modified')):
+        headers = {name: response.headers[name] for name in ('etag', 'last-modified', 'cache-control') if name in response.headers}
+        return Response(status_code=304, headers=headers)
+    return response
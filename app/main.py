@@ -1,22 +1,173 @@
+import asyncio
+import time
 from urllib.parse import unquote
 
 import uvicorn
-from fastapi import FastAPI, Query
+from brotli_asgi import BrotliMiddleware
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 # from typing import Annotated, Union
-
+from typing import List
+
+from app.admission import AdmissionControl, AdmissionLimit
+from app.http_cache import conditional_cache_middleware, get_validators
+from app.metrics import get_metrics_response, metrics_middleware
+from app.shared_snapshot import SharedSnapshot
+from clients.bronbro_api_client import BronbroApiClient, PriceFeedUnavailableError
+from clients.db_client import DBClient
+from common.cursor import InvalidCursorError
+from common.deadline import DeadlineExceededError, QueryBudgetExceededError, request_deadline
+from common.db_connector import DBConnector
+from services.candle_store import CandlesNotReadyError, CandleStore
+from services.market_stream import MarketStream
+from services.warm_up import WarmUp
 from services.warp_service import WarpService
 
 
+ADMISSION_LIMITS = {
+    '/tickers/': AdmissionLimit(16, 64, fallback=True),
+    '/dev/tickers/': AdmissionLimit(16, 64, fallback=True),
+    '/v1/spot/summary': AdmissionLimit(8, 32, fallback=True),
+    '/v1/dev/spot/summary': AdmissionLimit(8, 32, fallback=True),
+    '/v1/spot/ticker': AdmissionLimit(8, 32, fallback=True),
+    '/v1/dev/spot/ticker': AdmissionLimit(8, 32, fallback=True),
+    '/v1/24h_volume_in_usd': AdmissionLimit(8, 32, fallback=True),
+    '/historical_trades/{ticker_id:path}/': AdmissionLimit(16, 32),
+    '/v1/spot/recent': AdmissionLimit(16, 32),
+    '/v1/spot/trades': AdmissionLimit(8, 16),
+    '/v1/spot/candles': AdmissionLimit(8, 16),
+    '/v1/spot/stats': AdmissionLimit(8, 32, fallback=True),
+    '/v1/volume_in_usd': AdmissionLimit(8, 32, fallback=True),
+    '/v1/spot/export': AdmissionLimit(2, retry_after=10),
+    '/v1/stream/tickers': AdmissionLimit(256, retry_after=5),
+}
+
+
 def start_application():
     app = FastAPI()
+    app.middleware("http")(conditional_cache_middleware)
+    app.middleware("http")(AdmissionControl(ADMISSION_LIMITS))
+    app.middleware("http")(metrics_middleware)
+    app.add_middleware(BrotliMiddleware, minimum_size=1000, excluded_handlers=['^/v1/stream/'])
+
+    @app.exception_handler(PriceFeedUnavailableError)
+    async def price_feed_unavailable(request: Request, error: PriceFeedUnavailableError):
+        return JSONResponse(
+            {'detail': str(error)}, status_code=503,
+            headers={'Retry-After': str(BronbroApiClient.exchange_rates_breaker.reset_timeout)},
+        )
+
+    @app.on_event("startup")
+    async def start_background_tasks():
+        WarmUp().start()
+        SharedSnapshot().start()
+        CandleStore().start(DBClient())
+
+    @app.on_event("shutdown")
+    async def close_clients():
+        WarmUp().stop()
+        CandleStore().stop()
+        await SharedSnapshot().stop()
+        await BronbroApiClient.close()
+        DBConnector().close()
+
     return app
 
 
 app = start_application()
 
+REQUEST_TIMEOUT = 15
+
+MAX_BATCH_TICKERS = 50
+MAX_BATCH_LIMIT = 1000
+
+EXPORT_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+async def wait_for_disconnect(request):
+    while (await request.receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def run_with_deadline(request, loader, timeout=REQUEST_TIMEOUT):
+    token = request_deadline.set(time.monotonic() + timeout)
+    try:
+        task = asyncio.ensure_future(loader())
+    finally:
+        request_deadline.reset(token)
+    disconnect = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait([task, disconnect], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if disconnect.done() and not task.done():
+            raise HTTPException(status_code=499, detail='Client closed request')
+        if not task.done():
+            raise DeadlineExceededError('Request deadline exceeded')
+        return task.result()
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except QueryBudgetExceededError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except CandlesNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': str(CandleStore.poll_interval)})
+    finally:
+        disconnect.cancel()
+        if not task.done():
+            task.cancel()
+
+
+async def get_trades_page(request, get_trades, ticker_id, limit, offset, type, start_time, end_time, cursor):
+    try:
+        return await run_with_deadline(request, lambda: get_trades(ticker_id, limit, offset, type, start_time, end_time, cursor))
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_snapshot_response(height, content):
+    return JSONResponse(jsonable_encoder(content), headers=get_validators(height))
+
+
+async def get_shared_view(name, loader):
+    shared = SharedSnapshot().read(name)
+    if shared is not None:
+        height, body = shared
+        return Response(content=body, media_type='application/json', headers=get_validators(height))
+    return get_snapshot_response(*await loader())
+
+
+@app.get("/health/live")
+async def get_liveness():
+    """
+    Liveness probe, answers as soon as the process serves requests.
+    """
+    return {'status': 'ok'}
+
+
+@app.get("/health/ready")
+async def get_readiness():
+    """
+    Readiness probe, answers 503 until pools, denom traces, the block height index
+    and the first ticker snapshot are loaded.
+
+    returns\n
+    - status (string): ready or warming_up.\n
+    - height (integer): Latest indexed block height.\n
+    - error (string): Last warm-up error, while still warming up.\n
+    """
+    warm_up = WarmUp()
+    return JSONResponse(warm_up.get_status(), status_code=200 if warm_up.ready else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return get_metrics_response()
+
 
 @app.get("/pairs/")
-def get_pairs():
+async def get_pairs():
     """
     This method retrieves all trading pairs available on the specified DEX.
     Each trading pair consists of a base asset and a target asset. Additionally, it provides the
@@ -31,11 +182,11 @@ def get_pairs():
     - Ticker ID (ticker_id): The unique identifier of the ticker, including both base and quote assets
     with a delimiter to separate them (e.g., boot_hydrogen for the price of BOOT quoted in HYDROGEN).
     """
-    return WarpService().get_pairs(False)
+    return await WarpService().get_pairs(False)
 
 
 @app.get("/dev/pairs/")
-def get_pairs():
+async def get_pairs():
     """
     This method retrieves all trading pairs available on the specified DEX.
     Each trading pair consists of a base asset and a target asset. Additionally, it provides the
@@ -50,11 +201,11 @@ def get_pairs():
     - Ticker ID (ticker_id): The unique identifier of the ticker, including both base and quote assets
     with a delimiter to separate them (e.g., boot_hydrogen for the price of BOOT quoted in HYDROGEN).
     """
-    return WarpService().get_pairs(True)
+    return await WarpService().get_pairs(True)
 
 
 @app.get("/dev/tickers/")
-def get_pairs():
+async def get_pairs():
     """
     ONLY FOR API DEVS PORPOSES AND USAGE!
     FOR INTEGRATION USE /tickers/ endpoint instead
@@ -79,11 +230,11 @@ def get_pairs():
     - Base Volume (base_volume): The traded volume of base tokens in the last 24 hours.\n
     - Target Volume (target_volume): The traded volume of target tokens in the last 24 hours.
     """
-    return WarpService().get_tickers(True)
+    return await get_shared_view('dev_tickers', lambda: WarpService().get_tickers(True))
 
 
 @app.get("/tickers/")
-def get_pairs():
+async def get_pairs():
     """
     This method retrieves all available tickers on the specified DEX.
     A ticker represents the current trading information for a specific trading
@@ -104,11 +255,11 @@ def get_pairs():
     - Base Volume (base_volume): The traded volume of base tokens in the last 24 hours.\n
     - Target Volume (target_volume): The traded volume of target tokens in the last 24 hours.
     """
-    return WarpService().get_tickers(False)
+    return await get_shared_view('tickers', lambda: WarpService().get_tickers(False))
 
 
 @app.get("/historical_trades/{ticker_id:path}/", name="path-convertor")
-def get_historical_trades(ticker_id, limit: int = 10, offset: int = 0, type: str = '', start_time: int = 0, end_time: int = 0):
+async def get_historical_trades(ticker_id, request: Request, response: Response, limit: int = 10, offset: int = 0, type: str = '', start_time: int = 0, end_time: int = 0, cursor: str = ''):
     """
     This method retrieves historical trades for the requested trading pair. Each trade
     record includes a unique trade ID, timestamp in Unix format, ticker ID, type of
@@ -118,14 +269,17 @@ def get_historical_trades(ticker_id, limit: int = 10, offset: int = 0, type: str
     params\n
     - ticker_id: str. (e.g., boot_hydrogen for the price of BOOT quoted in HYDROGEN) \n
     - limit: int. default 10. \n
-    - offset: int. default 0 \n
+    - offset: int. default 0. Ignored when cursor is set \n
     - type: str. buy or sell \n
     - start_time: int. Unix timestamp \n
     - end_time: int. Unix timestamp \n
+    - cursor: str. Value of the X-Next-Cursor header from the previous page \n
 
 
     returns\n
 
+    The X-Next-Cursor header is set when a next page may exist.\n
+
     - Trade ID (id): A unique identifier for the trade.\n
     - Trade timestamp (trade_timestamp): The timestamp of the trade in Unix format.\n
     - Ticker ID (ticker_id): The unique identifier of the ticker associated with the trade (e.g., boot_hydrogen for the
@@ -135,11 +289,14 @@ def get_historical_trades(ticker_id, limit: int = 10, offset: int = 0, type: str
     - Target Volume (target_volume): The volume of target tokens involved in the trade.\n
     - Trade Price (trade_price): The price at which the trade occurred.
     """
-    return WarpService().get_historical_trades(ticker_id, limit, offset, type, start_time, end_time)
+    trades, next_cursor = await get_trades_page(request, WarpService().get_historical_trades, ticker_id, limit, offset, type, start_time, end_time, cursor)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return trades
 
 
 @app.get("/v1/spot/summary")
-def get_spot_summary():
+async def get_spot_summary():
     """
         Overview of market data for all tickers and all markets.
 
@@ -155,10 +312,10 @@ def get_spot_summary():
         - highest_price_24h (decimal): Highest price of base currency based on given quote currency in the last 24-hrs.\n
         - lowest_price_24h (decimal): Lowest price of base currency based on given quote currency in the last 24-hrs.\n
     """
-    return WarpService().get_spot_summary(False)
+    return await get_shared_view('spot_summary', lambda: WarpService().get_spot_summary(False))
 
 @app.get("/v1/dev/spot/summary")
-def get_spot_summary():
+async def get_spot_summary():
     """
         Overview of market data for all tickers and all markets.
 
@@ -174,11 +331,11 @@ def get_spot_summary():
         - highest_price_24h (decimal): Highest price of base currency based on given quote currency in the last 24-hrs.\n
         - lowest_price_24h (decimal): Lowest price of base currency based on given quote currency in the last 24-hrs.\n
     """
-    return WarpService().get_spot_summary(True)
+    return await get_shared_view('dev_spot_summary', lambda: WarpService().get_spot_summary(True))
 
 
 @app.get("/v1/wallet/assets")
-def get_spot_ticker():
+async def get_spot_ticker():
     """
     In depth details on crypto currencies available on the exchange
 
@@ -187,11 +344,11 @@ def get_spot_ticker():
     - name (string): Full name of cryptocurrency.\n
     - contractAddress (string): Contract address of the asset on each chain.\n
     """
-    return WarpService().get_wallet_assets()
+    return await WarpService().get_wallet_assets()
 
 
 @app.get("/v1/spot/ticker")
-def get_spot_ticker():
+async def get_spot_ticker():
     """
     24-hour rolling window price change statistics for all markets.
 
@@ -201,10 +358,10 @@ def get_spot_ticker():
     - base_volume (decimal): 24-hour trading volume denoted in BASE currency.\n
     - quote_volume (decimal): 24-hour trading volume denoted in QUOTE currency.\n
     """
-    return WarpService().get_spot_ticker(False)
+    return await get_shared_view('spot_ticker', lambda: WarpService().get_spot_ticker(False))
 
 @app.get("/v1/dev/spot/ticker")
-def get_spot_ticker():
+async def get_spot_ticker():
     """
     24-hour rolling window price change statistics for all markets.
 
@@ -214,11 +371,11 @@ def get_spot_ticker():
     - base_volume (decimal): 24-hour trading volume denoted in BASE currency.\n
     - quote_volume (decimal): 24-hour trading volume denoted in QUOTE currency.\n
     """
-    return WarpService().get_spot_ticker(True)
+    return await get_shared_view('dev_spot_ticker', lambda: WarpService().get_spot_ticker(True))
 
 
 @app.get("/v1/spot/recent")
-def get_spot_recent(ticker_root: str ='', limit: int = 10, offset: int = 0, type: str = '', start_time: int = 0, end_time: int = 0):
+async def get_spot_recent(request: Request, response: Response, ticker_root: str ='', limit: int = 10, offset: int = 0, type: str = '', start_time: int = 0, end_time: int = 0, cursor: str = ''):
     """
     Recently completed trades for a given market. 24 hour historical full trades available as minimum requirement.
     :param ticker_root:
@@ -227,10 +384,13 @@ def get_spot_recent(ticker_root: str ='', limit: int = 10, offset: int = 0, type
     :param type:
     :param start_time:
     :param end_time:
+    :param cursor: value of the X-Next-Cursor header from the previous page, offset is ignored when set
 
 
     returns\n
 
+    The X-Next-Cursor header is set when a next page may exist.\n
+
     - trade_id (integer): A unique ID associated with the trade for the currency pair transaction.\n
     - price (decimal): Last transacted price of base currency based on given quote currency.\n
     - base_volume (decimal): Transaction amount in BASE currency.\n
@@ -238,15 +398,178 @@ def get_spot_recent(ticker_root: str ='', limit: int = 10, offset: int = 0, type
     - timestamp (Integer): Unix timestamp in milliseconds for when the transaction occurred.\n
     - type (string): Used to determine whether the transaction originated as a buy or sell.\n
     """
-    return WarpService().get_spot_recent(ticker_root, limit, offset, type, start_time, end_time)
+    trades, next_cursor = await get_trades_page(request, WarpService().get_spot_recent, ticker_root, limit, offset, type, start_time, end_time, cursor)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return trades
+
+
+@app.get("/v1/spot/trades")
+async def get_historical_trades_batch(request: Request, ticker_id: List[str] = Query(default=[]), limit: int = 10, type: str = '', start_time: int = 0, end_time: int = 0):
+    """
+    Latest trades for several trading pairs at once, newest first within each pair.
+
+
+    params\n
+    - ticker_id: str. Repeatable, up to 50 (e.g., boot_hydrogen for the price of BOOT quoted in HYDROGEN) \n
+    - limit: int. Trades per ticker. default 10, at most 1000 \n
+    - type: str. buy or sell \n
+    - start_time: int. Unix timestamp \n
+    - end_time: int. Unix timestamp \n
+
+
+    returns\n
+
+    Object keyed by ticker_id, each value is a list of trades in the /historical_trades/ format.
+    Unknown tickers map to an empty list.
+    """
+    if not ticker_id or len(set(ticker_id)) > MAX_BATCH_TICKERS:
+        raise HTTPException(status_code=400, detail=f'Between 1 and {MAX_BATCH_TICKERS} ticker_id values are required')
+    if not 0 < limit <= MAX_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f'limit must be between 1 and {MAX_BATCH_LIMIT}')
+    return await run_with_deadline(request, lambda: WarpService().get_historical_trades_batch(tuple(sorted(set(ticker_id))), limit, type, start_time, end_time))
+
+
+@app.get("/v1/spot/export")
+async def export_trades(ticker_id: str, start_time: int = 0, end_time: int = 0, format: str = 'ndjson'):
+    """
+    Bulk export of all trades for a given market, streamed oldest first.
+
+    params\n
+    - ticker_id: str. (e.g., boot_hydrogen for the price of BOOT quoted in HYDROGEN) \n
+    - start_time: int. Unix timestamp, inclusive \n
+    - end_time: int. Unix timestamp, exclusive \n
+    - format: str. ndjson or csv. default ndjson \n
+
+
+    returns\n
+
+    One record per trade with id, trade_timestamp, height, type, base_volume, target_volume and price.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f'Unsupported format: {format}')
+    return StreamingResponse(
+        WarpService().export_trades(ticker_id, start_time, end_time, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+    )
+
+
+@app.get("/v1/spot/candles")
+async def get_candles(request: Request, ticker_id: str, interval: str = '1h', start: int = 0, end: int = 0):
+    """
+    OHLCV candles for a given market, oldest first.
+
+    params\n
+    - ticker_id: str. (e.g., boot_hydrogen for the price of BOOT quoted in HYDROGEN) \n
+    - interval: str. 1m, 5m, 1h or 1d. default 1h \n
+    - start: int. Unix timestamp. default 300 intervals before end \n
+    - end: int. Unix timestamp, exclusive. default now \n
+
+
+    returns\n
+
+    - timestamp (integer): Unix timestamp of the start of the candle.\n
+    - open (decimal): First traded price in the candle.\n
+    - high (decimal): Highest traded price in the candle.\n
+    - low (decimal): Lowest traded price in the candle.\n
+    - close (decimal): Last traded price in the candle.\n
+    - base_volume (decimal): Volume traded in BASE currency.\n
+    - quote_volume (decimal): Volume traded in QUOTE currency.\n
+    """
+    if interval not in CandleStore.intervals:
+        raise HTTPException(status_code=400, detail=f'Unsupported interval: {interval}')
+    seconds = CandleStore.intervals[interval]
+    end = end or int(time.time())
+    start = start or end - seconds * 300
+    if start >= end or (end - start) // seconds > CandleStore.max_candles:
+        raise HTTPException(status_code=400, detail=f'Time range must cover between 1 and {CandleStore.max_candles} candles')
+    return get_snapshot_response(*await run_with_deadline(request, lambda: WarpService().get_candles(ticker_id, interval, start, end)))
+
+
+def get_window(start_time, end_time):
+    # a window ending now ends on the last whole minute, so repeated calls share a cache key
+    now = int(time.time()) // 60 * 60
+    end_time = min(end_time or now, now)
+    if not 0 < start_time < end_time:
+        raise HTTPException(status_code=400, detail='from must be a Unix timestamp before to and now')
+    return start_time, end_time
+
+
+@app.get("/v1/volume_in_usd")
+async def get_volume_in_usd(request: Request, start_time: int = Query(alias='from'), end_time: int = Query(default=0, alias='to')):
+    """
+    Volume in usd over an arbitrary time window, built from daily, hourly and minute rollups.
+
+    params\n
+    - from: int. Unix timestamp, inclusive \n
+    - to: int. Unix timestamp, exclusive. default and at most now, rounded down to the minute \n
+
+
+    returns\n
+
+    - value (decimal): Traded volume in USD.\n
+    - from (integer): Start of the window.\n
+    - to (integer): End of the window.\n
+    """
+    start_time, end_time = get_window(start_time, end_time)
+    return get_snapshot_response(*await run_with_deadline(request, lambda: WarpService().get_volume_in_usd(start_time, end_time)))
+
+
+@app.get("/v1/spot/stats")
+async def get_spot_stats(request: Request, start_time: int = Query(alias='from'), end_time: int = Query(default=0, alias='to')):
+    """
+    Market statistics for all tickers over an arbitrary time window, from successful swaps only.
+
+    params\n
+    - from: int. Unix timestamp, inclusive \n
+    - to: int. Unix timestamp, exclusive. default and at most now, rounded down to the minute \n
+
+
+    returns\n
+
+    - trading_pairs (string): Identifier of a ticker with delimiter to separate base/quote.\n
+    - first_price (decimal): First transacted price in the window.\n
+    - last_price (decimal): Last transacted price in the window.\n
+    - highest_price (decimal): Highest price in the window.\n
+    - lowest_price (decimal): Lowest price in the window.\n
+    - base_volume (decimal): Volume of market pair denoted in BASE currency.\n
+    - quote_volume (decimal): Volume of market pair denoted in QUOTE currency.\n
+    - price_change_percent (decimal): % price change of market pair over the window.\n
+    """
+    start_time, end_time = get_window(start_time, end_time)
+    return get_snapshot_response(*await run_with_deadline(request, lambda: WarpService().get_spot_stats(start_time, end_time)))
+
+
+@app.get("/v1/stream/tickers")
+async def stream_tickers(ticker_id: List[str] = Query(default=[])):
+    """
+    Server-Sent Events stream of market updates, one event per newly indexed block.
+
+    params\n
+    - ticker_id: str. Repeatable, only send updates for these tickers (e.g., boot_hydrogen). Default all \n
+
+
+    returns\n
+
+    Events of type market. The first event carries every ticker, later ones only what changed.
+    A client that falls behind is disconnected and gets the full state again on reconnect.\n
+    - height (integer): Block height the update was computed at.\n
+    - tickers (list): Changed tickers, in the /tickers/ format.\n
+    - trades (list): Trades indexed since the previous event with id, height, ticker_id, type, base_volume, target_volume and price.\n
+    """
+    return StreamingResponse(
+        MarketStream().events(set(ticker_id)),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 
 @app.get("/v1/24h_volume_in_usd")
-def get_spot_recent():
+async def get_spot_recent():
     """
     Last 24 hours volume in usd
     """
-    return WarpService().get_24_volume_usd()
+    return await get_shared_view('volume_usd', lambda: WarpService().get_24_volume_usd())
 
 if __name__ == '__main__':
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,35 @@
+import os
+import time
+
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+from starlette.routing import Match
+
+from common.metrics import REQUEST_DURATION
+
+
+def get_route_path(request):
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return 'unmatched'
+
+
+async def metrics_middleware(request: Request, call_next):
+    start = time.perf_counter()
+    status = '500'
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        REQUEST_DURATION.labels(get_route_path(request), request.method, status).observe(time.perf_counter() - start)
+
+
+def get_metrics_response():
+    registry = REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
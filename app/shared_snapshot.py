@@ -0,0 +1,153 @@
+import asyncio
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from services.warp_service import WarpService
+
+
+logger = logging.getLogger(__name__)
+
+# built straight from the snapshot views, the SWR-cached endpoint methods may still hold an older block
+SHARED_VIEWS = {
+    'tickers': ('get_tickers_view', (False,)),
+    'dev_tickers': ('get_tickers_view', (True,)),
+    'spot_summary': ('get_spot_summary_view', (False,)),
+    'dev_spot_summary': ('get_spot_summary_view', (True,)),
+    'spot_ticker': ('get_spot_ticker_view', (False,)),
+    'dev_spot_ticker': ('get_spot_ticker_view', (True,)),
+    'volume_usd': ('get_24_volume_usd_view', ()),
+}
+
+
+class SharedSnapshot(object):
+    publish_interval = 1
+    max_age = 30
+    # a leader failing this many publishes in a row releases the lock and waits max_age before competing again
+    max_failures = 3
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(SharedSnapshot, cls).__new__(cls)
+            cls.instance.path = os.environ.get('SHARED_SNAPSHOT_PATH')
+            cls.instance.lock_file = None
+            cls.instance.failures = 0
+            cls.instance.lock_retry_at = 0
+            cls.instance.task = None
+            cls.instance.published_height = None
+            cls.instance.buffer = None
+            cls.instance.inode = None
+            cls.instance.index = None
+        return cls.instance
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    @property
+    def is_leader(self):
+        return self.lock_file is not None
+
+    def start(self):
+        if self.enabled and self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def try_lock(self):
+        if time.monotonic() < self.lock_retry_at:
+            return False
+        lock_file = open(f'{self.path}.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def release(self):
+        self.lock_file.close()
+        self.lock_file = None
+        self.published_height = None
+        self.lock_retry_at = time.monotonic() + self.max_age
+
+    async def run(self):
+        while True:
+            try:
+                if self.is_leader or self.try_lock():
+                    await self.publish(WarpService())
+                    self.failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Publishing the shared snapshot failed')
+                self.failures += 1
+                if self.is_leader and self.failures >= self.max_failures:
+                    logger.warning('Releasing the shared snapshot lock after %s failed publishes', self.failures)
+                    self.release()
+                    self.failures = 0
+            await asyncio.sleep(self.publish_interval)
+
+    async def publish(self, service):
+        snapshot = await service.get_snapshot()
+        if snapshot.height == self.published_height:
+            await asyncio.to_thread(os.utime, self.path)
+            return
+        views = {}
+        for name, (method, args) in SHARED_VIEWS.items():
+            views[name] = JSONResponse(jsonable_encoder(await getattr(service, method)(snapshot, *args))).body
+        await asyncio.to_thread(self.write, snapshot.height, views)
+        self.published_height = snapshot.height
+
+    def write(self, height, views):
+        index = {'height': height, 'views': {}}
+        offset = 0
+        for name, body in views.items():
+            index['views'][name] = [offset, len(body)]
+            offset += len(body)
+        index_bytes = json.dumps(index).encode()
+        path = f'{self.path}.{os.getpid()}.tmp'
+        with open(path, 'wb') as file:
+            file.write(struct.pack('<Q', len(index_bytes)))
+            file.write(index_bytes)
+            for body in views.values():
+                file.write(body)
+        os.replace(path, self.path)
+
+    def map(self, inode):
+        with open(self.path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        index_length = struct.unpack_from('<Q', buffer)[0]
+        index = json.loads(buffer[8:8 + index_length])
+        if self.buffer is not None:
+            self.buffer.close()
+        self.buffer, self.inode, self.index = buffer, inode, index
+        self.base = 8 + index_length
+
+    def read(self, name):
+        if not self.enabled or self.is_leader:
+            return None
+        try:
+            stat = os.stat(self.path)
+            if stat.st_ino != self.inode:
+                self.map(stat.st_ino)
+        except (OSError, ValueError, struct.error):
+            return None
+        if time.time() - stat.st_mtime > self.max_age or name not in self.index['views']:
+            return None
+        offset, length = self.index['views'][name]
+        return self.index['height'], self.buffer[self.base + offset:self.base + offset + length]
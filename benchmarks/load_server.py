@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import re
+import threading
+import time
+
+import clickhouse_connect
+import httpx
+import uvicorn
+from clickhouse_connect.driver.query import QueryResult
+
+from benchmarks.synthetic_market import BLOCK_TIME, SyntheticDBClient, SyntheticMarket
+from clients.bronbro_api_client import BronbroApiClient
+from common.db_connector import DBConnector
+from services.swap_window import SWAP_COLUMNS
+
+
+class FakeClickHouseClient:
+    """
+    Stand-in for a clickhouse_connect client, so DBClient runs unchanged under load. Queries are
+    routed on the method name in their query_id, answered from a SyntheticMarket as QueryResults
+    and block their thread for `latency` seconds, counting how many threads are busy at once.
+    """
+    lock = threading.Lock()
+    busy = 0
+
+    def __init__(self, market, latency):
+        self.db_client = SyntheticDBClient(market)
+        self.latency = latency
+
+    def wait(self):
+        with self.lock:
+            FakeClickHouseClient.busy += 1
+        try:
+            time.sleep(self.latency)
+        finally:
+            with self.lock:
+                FakeClickHouseClient.busy -= 1
+
+    def get_number(self, query, pattern, default=0):
+        match = re.search(pattern, query)
+        return int(match.group(1)) if match else default
+
+    def get_numbers(self, query, pattern):
+        match = re.search(pattern, query)
+        return [int(item) for item in match.group(1).split(',')] if match else None
+
+    def get_trade_filters(self, query):
+        type = ''
+        if 'offer_coin_denom = lp.a_denom' in query:
+            type = 'sell'
+        elif 'offer_coin_denom != lp.a_denom' in query:
+            type = 'buy'
+        cursor = re.search(r'\(s.height, s.msg_index\) < \((\d+), (\d+)\)', query)
+        return (
+            type,
+            self.get_number(query, r'toUnixTimestamp\(`timestamp`\) > (\d+)'),
+            self.get_number(query, r'toUnixTimestamp\(`timestamp`\) < (\d+)'),
+            (int(cursor.group(1)), int(cursor.group(2))) if cursor else None,
+        )
+
+    def get_records(self, name, query, parameters):
+        db_client = self.db_client
+        if name == 'get_pairs_liquidity_pool':
+            return db_client.get_pairs_liquidity_pool(self.get_numbers(query, r'pool_id IN \(([\d, ]+)\)'))
+        if name == 'get_base_for_tickers':
+            return db_client.get_base_for_tickers()
+        if name == 'get_denom_traces':
+            return db_client.get_denom_traces()
+        if name == 'get_blocks_after_height':
+            return db_client.get_blocks_after_height(self.get_number(query, r'height > (\d+)'))
+        if name in ('get_blocks_after_timestamp', 'get_height_after_timestamp'):
+            method = getattr(db_client, name)
+            return method(re.search(r"`timestamp` > '([^']+)'", query).group(1))
+        if name in ('get_candles', 'backfill_candles', 'reconcile_candles'):
+            return db_client.get_candles(
+                self.get_number(query, r'toUnixTimestamp\(b.timestamp\), (\d+)\)'),
+                self.get_number(query, r'toUnixTimestamp\(`timestamp`\) >= (\d+)'),
+                self.get_number(query, r'toUnixTimestamp\(`timestamp`\) < (\d+)'),
+                self.get_number(query, r's.height <= (\d+)'),
+                self.get_number(query, r'WHERE pool_id = (\d+)'),
+            )
+        if name == 'get_swaps_between_heights':
+            match = re.search(r'height > (\d+) and height <= (\d+)', query)
+            return db_client.get_swaps_between_heights(int(match.group(1)), int(match.group(2)))
+        if name in ('get_historical_trades', 'get_spot_recent'):
+            type, start_time, end_time, cursor = self.get_trade_filters(query)
+            limit = re.search(r'LIMIT (\d+) OFFSET (\d+)', query)
+            method = getattr(db_client, name)
+            return method(parameters['ticker_id'], int(limit.group(1)), int(limit.group(2)), type, start_time, end_time, cursor)
+        if name == 'get_historical_trades_batch':
+            type, start_time, end_time, _ = self.get_trade_filters(query)
+            return db_client.get_historical_trades_batch(
+                self.get_numbers(query, r's.pool_id IN \(([\d, ]+)\)'), self.get_number(query, r'LIMIT (\d+) BY'),
+                type, start_time, end_time)
+        if name == 'get_query_log':
+            return []
+        raise ValueError(f'Unexpected synthetic query {name}')
+
+    def get_columns(self, name, query, parameters):
+        records = asyncio.run(self.get_records(name, query, parameters))
+        if name == 'get_swaps_between_heights':
+            return SWAP_COLUMNS, [list(column) for column in zip(*records)]
+        if records and not isinstance(records, list):
+            records = [records]
+        if not records:
+            return [], []
+        return list(records[0]._fields), [list(column) for column in zip(*records)]
+
+    def make_result(self, column_names, blocks, rows):
+        return QueryResult(block_gen=iter(blocks), column_names=tuple(column_names), summary={
+            'read_rows': str(rows), 'read_bytes': str(rows * 64),
+        })
+
+    def query(self, query, parameters=None, settings=None):
+        name = settings['query_id'][len('warp-'):settings['query_id'].rindex('-')]
+        column_names, columns = self.get_columns(name, ' '.join(query.split()), parameters or {})
+        self.wait()
+        return self.make_result(column_names, [columns] if columns else [], len(columns[0]) if columns else 0)
+
+    def query_row_block_stream(self, query, parameters=None, settings=None):
+        query = ' '.join(query.split())
+
+        async def collect():
+            return [block async for block in self.db_client.stream_trades_export(
+                parameters['ticker_id'],
+                self.get_number(query, r'toUnixTimestamp\(`timestamp`\) >= (\d+)'),
+                self.get_number(query, r'toUnixTimestamp\(`timestamp`\) < (\d+)'),
+            )]
+
+        blocks = [list(map(list, zip(*block))) for block in asyncio.run(collect())]
+        self.wait()
+        column_names = ['id', 'trade_timestamp', 'height', 'type', 'base_volume', 'target_volume', 'price']
+        return self.make_result(column_names, blocks, sum(len(block[0]) for block in blocks)).row_block_stream
+
+    def command(self, command, settings=None):
+        return None
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class LoadStats:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.samples = 0
+        self.busy_total = 0
+        self.max_busy = 0
+        self.waiting_total = 0
+        self.max_waiting = 0
+
+    def sample(self):
+        available = DBConnector().available
+        waiting = len(available._waiters or ()) if available is not None else 0
+        busy = FakeClickHouseClient.busy
+        self.samples += 1
+        self.busy_total += busy
+        self.max_busy = max(self.max_busy, busy)
+        self.waiting_total += waiting
+        self.max_waiting = max(self.max_waiting, waiting)
+
+    def as_dict(self):
+        samples = self.samples or 1
+        return {
+            'pool_size': DBConnector.pool_size,
+            'max_busy_threads': self.max_busy,
+            'mean_busy_threads': round(self.busy_total / samples, 2),
+            'max_waiting_for_connection': self.max_waiting,
+            'mean_waiting_for_connection': round(self.waiting_total / samples, 2),
+        }
+
+
+def build_app(args):
+    market = SyntheticMarket(args.pools, args.denoms, args.swaps_per_day, args.days, args.pending_blocks)
+    clickhouse_connect.get_client = lambda **kwargs: FakeClickHouseClient(market, args.db_latency)
+
+    async def price_feed(request):
+        await asyncio.sleep(args.feed_latency)
+        return httpx.Response(200, json=[{'symbol': 'ATOM', 'price': 10.0}])
+
+    BronbroApiClient.http_client = httpx.AsyncClient(transport=httpx.MockTransport(price_feed))
+
+    from app.main import app
+
+    stats = LoadStats()
+
+    async def sample_stats():
+        while True:
+            stats.sample()
+            await asyncio.sleep(args.sample_interval)
+
+    async def advance_blocks():
+        while True:
+            await asyncio.sleep(args.block_interval)
+            market.advance()
+
+    @app.on_event("startup")
+    async def start_load_tasks():
+        asyncio.ensure_future(sample_stats())
+        asyncio.ensure_future(advance_blocks())
+
+    @app.get("/load_test/stats", include_in_schema=False)
+    async def get_load_stats():
+        return stats.as_dict()
+
+    @app.post("/load_test/reset", include_in_schema=False)
+    async def reset_load_stats():
+        stats.reset()
+        return stats.as_dict()
+
+    return app
+
+
+def add_arguments(parser):
+    parser.add_argument('--pools', type=int, default=40)
+    parser.add_argument('--denoms', type=int, default=25)
+    parser.add_argument('--swaps-per-day', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--pending-blocks', type=int, default=2000)
+    parser.add_argument('--db-latency', type=float, default=0.02, help='seconds every fake ClickHouse query blocks its thread')
+    parser.add_argument('--feed-latency', type=float, default=0.05, help='seconds every fake price feed call takes')
+    parser.add_argument('--block-interval', type=float, default=BLOCK_TIME, help='seconds between new synthetic blocks')
+    parser.add_argument('--sample-interval', type=float, default=0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve app.main:app against a fake ClickHouse and price feed.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(build_app(args), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
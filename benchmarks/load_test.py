@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import itertools
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.load_server import add_arguments
+from benchmarks.synthetic_market import SyntheticMarket
+
+
+def get_routes(market):
+    ticker_ids = [market.get_ticker_id(pool_id) for pool_id, _, _ in market.pools]
+    ticker_id = ticker_ids[0]
+    batch = '&'.join(f'ticker_id={item}' for item in ticker_ids[:13])
+    return {
+        '/pairs/': '/pairs/',
+        '/dev/pairs/': '/dev/pairs/',
+        '/tickers/': '/tickers/',
+        '/dev/tickers/': '/dev/tickers/',
+        '/historical_trades/{ticker_id}/': f'/historical_trades/{ticker_id}/?limit=100',
+        '/v1/spot/summary': '/v1/spot/summary',
+        '/v1/dev/spot/summary': '/v1/dev/spot/summary',
+        '/v1/wallet/assets': '/v1/wallet/assets',
+        '/v1/spot/ticker': '/v1/spot/ticker',
+        '/v1/dev/spot/ticker': '/v1/dev/spot/ticker',
+        '/v1/spot/recent': f'/v1/spot/recent?ticker_root={ticker_id}&limit=100',
+        '/v1/spot/trades': f'/v1/spot/trades?{batch}&limit=20',
+        '/v1/spot/candles': f'/v1/spot/candles?ticker_id={ticker_id}&interval=5m',
+        '/v1/spot/export': f'/v1/spot/export?ticker_id={ticker_id}&start_time={int(time.time()) - 3600}',
+        '/v1/24h_volume_in_usd': '/v1/24h_volume_in_usd',
+    }
+
+
+async def wait_until_ready(client, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get('/health/ready')).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError('load server did not become ready')
+
+
+async def run_level(client, routes, concurrency, duration):
+    latencies = {name: [] for name in routes}
+    errors = {name: 0 for name in routes}
+    requests = itertools.cycle(routes.items())
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < deadline:
+            name, url = next(requests)
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies[name].append((time.perf_counter() - started) * 1000)
+            errors[name] += failed
+
+    await client.post('/load_test/reset')
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    stats = (await client.get('/load_test/stats')).json()
+    return latencies, errors, elapsed, stats
+
+
+def print_level(concurrency, latencies, errors, elapsed, stats):
+    total = sum(len(items) for items in latencies.values())
+    print(f'\nconcurrency={concurrency} requests={total} throughput={total / elapsed:.1f} req/s')
+    print(f'  db threads busy max/mean {stats["max_busy_threads"]}/{stats["mean_busy_threads"]} of {stats["pool_size"]}, '
+          f'waiting for a connection max/mean {stats["max_waiting_for_connection"]}/{stats["mean_waiting_for_connection"]}')
+    print(f'  {"route":<34}{"req/s":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}')
+    for name, items in latencies.items():
+        if not items:
+            continue
+        p50, p95, p99 = np.percentile(items, [50, 95, 99])
+        print(f'  {name:<34}{len(items) / elapsed:>8.1f}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{errors[name]:>8}')
+
+
+async def run(args, routes):
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=f'http://{args.host}:{args.port}', limits=limits, timeout=args.timeout) as client:
+        await wait_until_ready(client, args.startup_timeout)
+        for concurrency in args.concurrency:
+            print_level(concurrency, *await run_level(client, routes, concurrency, args.duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep concurrency against app.main:app served with a fake ClickHouse and price feed.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--duration', type=float, default=10, help='seconds per concurrency level')
+    parser.add_argument('--routes', nargs='+', help='route templates to drive, default all')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--startup-timeout', type=float, default=60)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    routes = get_routes(SyntheticMarket(args.pools, args.denoms, 1, 1, 0))
+    if args.routes:
+        routes = {name: url for name, url in routes.items() if name in args.routes}
+
+    server_args = [
+        '--host', args.host, '--port', str(args.port),
+        '--pools', str(args.pools), '--denoms', str(args.denoms), '--swaps-per-day', str(args.swaps_per_day),
+        '--days', str(args.days), '--pending-blocks', str(args.pending_blocks),
+        '--db-latency', str(args.db_latency), '--feed-latency', str(args.feed_latency),
+        '--block-interval', str(args.block_interval), '--sample-interval', str(args.sample_interval),
+    ]
+    print(f'db latency {args.db_latency * 1000:.0f} ms, price feed latency {args.feed_latency * 1000:.0f} ms, '
+          f'{args.pools} pools, {args.swaps_per_day} swaps/day, {args.duration:.0f}s per level')
+    server = subprocess.Popen([sys.executable, '-m', 'benchmarks.load_server'] + server_args)
+    try:
+        asyncio.run(run(args, routes))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from clients.db_client import DBClient
+from common.db_connector import DBConnector
+from services.swap_window import RollingSwapWindow
+
+
+LEGACY_SPOT_SUMMARY_QUERY = """
+SELECT DISTINCT *
+FROM
+  (SELECT b.pool_id AS pool_id,
+          CONCAT(a_denom, '_', b_denom) AS trading_pairs,
+          lp_t.last_price AS last_price,
+          min_max.lowest_price_24h AS lowest_price_24h,
+          min_max.highest_price_24h AS highest_price_24h,
+          fp.first_price AS first_price,
+          volumes.base_volume AS base_volume,
+          volumes.quote_volume AS quote_volume,
+          hb.highest_bid AS highest_bid,
+          la.lowest_ask AS lowest_ask
+   FROM spacebox.liquidity_pool AS b
+   LEFT JOIN
+     (SELECT pool_id,
+             swap_price AS last_price
+      FROM
+        (SELECT *,
+                RANK () OVER (PARTITION BY pool_id
+                              ORDER BY height DESC) AS custon_rank
+         FROM spacebox.swap
+         WHERE height > {height})
+      WHERE custon_rank = 1 ) AS lp_t ON b.pool_id = lp_t.pool_id
+   LEFT JOIN
+     (SELECT pool_id,
+             min(swap_price) AS lowest_price_24h,
+             max(swap_price) AS highest_price_24h
+      FROM spacebox.swap
+      WHERE height > {height}
+      GROUP BY pool_id) AS min_max ON min_max.pool_id = b.pool_id
+   LEFT JOIN
+     (SELECT pool_id,
+             swap_price AS first_price
+      FROM
+        (SELECT *,
+                RANK () OVER (PARTITION BY pool_id
+                              ORDER BY height ASC) AS custon_rank
+         FROM spacebox.swap
+         WHERE height > {height} )
+      WHERE custon_rank = 1 ) AS fp ON fp.pool_id = b.pool_id
+   LEFT JOIN
+     (SELECT sum(base_volume) AS base_volume,
+             sum(target_volume) AS quote_volume,
+             pool_id
+      FROM
+        (SELECT pool_id,
+                if(offer_coin_denom = a_denom, offer_coin_amount, exchanged_demand_coin_amount) AS base_volume,
+                if(offer_coin_denom = b_denom, offer_coin_amount, exchanged_demand_coin_amount) AS target_volume
+         FROM
+           (SELECT s.*,
+                   pool_id,
+                   CONCAT(a_denom, '_', b_denom) AS ticker_id,
+                   a_denom,
+                   b_denom
+            FROM spacebox.liquidity_pool AS lp FINAL
+            LEFT JOIN
+              (SELECT *
+               FROM spacebox.swap FINAL) AS s ON s.pool_id = lp.pool_id
+            WHERE s.success = TRUE
+              AND s.height > {height} ))
+      GROUP BY pool_id) AS volumes ON volumes.pool_id = b.pool_id
+   LEFT JOIN
+     (SELECT max(price) AS highest_bid,
+             pool_id
+      FROM
+        (SELECT pool_id,
+                if(offer_coin_denom = a_denom, 'sell', 'buy') AS TYPE,
+                swap_price AS price
+         FROM
+           (SELECT s.*,
+                   pool_id,
+                   a_denom,
+                   b_denom
+            FROM spacebox.liquidity_pool AS lp FINAL
+            LEFT JOIN
+              (SELECT *
+               FROM spacebox.swap FINAL) AS s ON s.pool_id = lp.pool_id
+            WHERE s.success = TRUE
+              AND s.height > {height} )
+         WHERE TYPE = 'sell' )
+      GROUP BY pool_id) AS hb ON hb.pool_id = b.pool_id
+   LEFT JOIN
+     (SELECT min(price) AS lowest_ask,
+             pool_id
+      FROM
+        (SELECT pool_id,
+                if(offer_coin_denom = a_denom, 'sell', 'buy') AS TYPE,
+                swap_price AS price
+         FROM
+           (SELECT s.*,
+                   pool_id,
+                   a_denom,
+                   b_denom
+            FROM spacebox.liquidity_pool AS lp FINAL
+            LEFT JOIN
+              (SELECT *
+               FROM spacebox.swap FINAL) AS s ON s.pool_id = lp.pool_id
+            WHERE s.success = TRUE
+              AND s.height > {height} )
+         WHERE TYPE = 'buy' )
+      GROUP BY pool_id) AS la ON la.pool_id = b.pool_id)
+"""
+
+LEGACY_SPOT_TICKER_QUERY = """
+SELECT DISTINCT *
+FROM
+  (SELECT b.pool_id AS pool_id,
+          CONCAT(a_denom, '_', b_denom) AS trading_pairs,
+          lp_t.last_price AS last_price,
+          volumes.base_volume AS base_volume,
+          volumes.quote_volume AS quote_volume
+   FROM spacebox.liquidity_pool AS b
+   LEFT JOIN
+     (SELECT pool_id,
+             swap_price AS last_price
+      FROM
+        (SELECT *,
+                RANK () OVER (PARTITION BY pool_id
+                              ORDER BY height DESC) AS custon_rank
+         FROM spacebox.swap
+         WHERE height > {height})
+      WHERE custon_rank = 1 ) AS lp_t ON b.pool_id = lp_t.pool_id
+   LEFT JOIN
+     (SELECT sum(base_volume) AS base_volume,
+             sum(target_volume) AS quote_volume,
+             pool_id
+      FROM
+        (SELECT pool_id,
+                if(offer_coin_denom = a_denom, offer_coin_amount, exchanged_demand_coin_amount) AS base_volume,
+                if(offer_coin_denom = b_denom, offer_coin_amount, exchanged_demand_coin_amount) AS target_volume
+         FROM
+           (SELECT s.*,
+                   pool_id,
+                   CONCAT(a_denom, '_', b_denom) AS ticker_id,
+                   a_denom,
+                   b_denom
+            FROM spacebox.liquidity_pool AS lp FINAL
+            LEFT JOIN
+              (SELECT *
+               FROM spacebox.swap FINAL) AS s ON s.pool_id = lp.pool_id
+            WHERE s.success = TRUE
+              AND s.height > {height} ))
+      GROUP BY pool_id) AS volumes ON volumes.pool_id = b.pool_id
+)
+"""
+
+
+def run_query(client, name, query):
+    started = time.perf_counter()
+    result = client.query(query)
+    elapsed = time.perf_counter() - started
+    summary = getattr(result, 'summary', None) or {}
+    return {
+        'name': name,
+        'elapsed_ms': round(elapsed * 1000, 1),
+        'read_rows': int(summary.get('read_rows', 0)),
+        'read_bytes': int(summary.get('read_bytes', 0)),
+        'result_rows': len(result.result_rows),
+    }
+
+
+def get_height_24_hours_ago(client):
+    timestamp = datetime.strftime(datetime.now() - timedelta(hours=24), '%Y-%m-%d %H:%M:%S')
+    result = client.query(f"select height from spacebox.block FINAL where `timestamp` > '{timestamp}' order by height ASC LIMIT 1")
+    return result.result_rows[0][0] if result.result_rows else 0
+
+
+def get_latest_height(client):
+    return client.query("select max(height) from spacebox.block").result_rows[0][0]
+
+
+class QueryRecorder(DBClient):
+
+    def __init__(self):
+        self.queries = []
+
+    async def make_row_query(self, query, name, settings=None):
+        self.queries.append(query)
+        return []
+
+
+def get_swap_window_query(from_height, to_height):
+    recorder = QueryRecorder()
+    asyncio.run(recorder.get_swaps_between_heights(from_height, to_height))
+    return recorder.queries[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare rows read by the legacy spot summary queries and the rolling swap window reads.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--height', type=int, default=None)
+    args = parser.parse_args()
+
+    client = DBConnector().create_client()
+    height = args.height if args.height is not None else get_height_24_hours_ago(client)
+
+    latest_height = get_latest_height(client)
+
+    # both legacy queries ran on every request, the rolling swap window loads the 24h once and then
+    # only reads the newest heights on each block
+    cases = [
+        ('legacy spot summary', LEGACY_SPOT_SUMMARY_QUERY.format(height=height)),
+        ('legacy spot ticker', LEGACY_SPOT_TICKER_QUERY.format(height=height)),
+        ('swap window load', get_swap_window_query(height, latest_height)),
+        ('swap window sync per block', get_swap_window_query(latest_height - RollingSwapWindow.reread_heights - 1, latest_height)),
+    ]
+    print(f'height > {height}, latest {latest_height}')
+    print(f'{"query":<36}{"elapsed ms":>12}{"read rows":>14}{"read bytes":>16}{"rows":>8}')
+    for name, query in cases:
+        runs = [run_query(client, name, query) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run['elapsed_ms'])
+        print(f'{name:<36}{best["elapsed_ms"]:>12}{best["read_rows"]:>14}{best["read_bytes"]:>16}{best["result_rows"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+import asyncio
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+ATOM_DENOM_HASH = '15E9C5CF5969080539DB395FA7D9C0868265217EFC528433671AAF9B1912D159'
+BLOCK_TIME = 6
+BLOCKS_PER_DAY = 24 * 60 * 60 // BLOCK_TIME
+
+Block = namedtuple('Block', ['height', 'timestamp'])
+Height = namedtuple('Height', ['height'])
+DenomTrace = namedtuple('DenomTrace', ['denom_hash', 'base_denom'])
+Pair = namedtuple('Pair', ['base', 'target', 'pool_id', 'ticker_id'])
+Ticker = namedtuple('Ticker', ['base_currency', 'target_currency', 'pool_id', 'ticker_id', 'liquidity_a', 'liquidity_b', 'last_price'])
+HistoricalTrade = namedtuple('HistoricalTrade', ['id', 'trade_timestamp', 'ticker_id', 'type', 'base_volume', 'target_volume', 'price', 'height', 'msg_index'])
+SpotTrade = namedtuple('SpotTrade', ['trade_id', 'timestamp', 'type', 'base_volume', 'quote_volume', 'price', 'height', 'msg_index'])
+Candle = namedtuple('Candle', ['pool_id', 'bucket', 'open', 'high', 'low', 'close', 'base_volume', 'quote_volume'])
+
+
+class SyntheticMarket:
+    """
+    Deterministic liquidity_pool, swap, block and denom_trace data.
+
+    Pool 1 is boot/hydrogen and pool 2 hydrogen/ATOM so that USD conversion works, every other
+    denom gets a hydrogen pool and the remaining pools pair random denoms. The last `pending_blocks`
+    blocks are hidden until `advance` releases them one at a time, to simulate new blocks arriving.
+    """
+
+    def __init__(self, pools=40, denoms=25, swaps_per_day=20000, days=2, pending_blocks=100, seed=1):
+        random = np.random.default_rng(seed)
+        prefixes = ['u', 'milli', '']
+        extra_denoms = [f'{prefixes[i % 3]}token{i}' for i in range(max(0, min(denoms - 3, pools - 2)))]
+        pairs = [('boot', 'hydrogen'), ('hydrogen', f'ibc/{ATOM_DENOM_HASH}')]
+        pairs += [('hydrogen', denom) for denom in extra_denoms]
+        while len(pairs) < pools:
+            a, b = random.choice(len(extra_denoms), 2, replace=False)
+            pairs.append((extra_denoms[a], extra_denoms[b]))
+        self.pools = [(pool_id, a, b) for pool_id, (a, b) in enumerate(pairs[:pools], start=1)]
+        self.denom_traces = [DenomTrace(ATOM_DENOM_HASH, 'uatom')]
+
+        self.last_height = days * BLOCKS_PER_DAY + pending_blocks
+        self.tip = self.last_height - pending_blocks
+        now = datetime.now()
+        self.blocks = [
+            Block(height, now - timedelta(seconds=(self.tip - height) * BLOCK_TIME))
+            for height in range(1, self.last_height + 1)
+        ]
+        self.block_timestamps = np.array([int(block.timestamp.timestamp()) for block in self.blocks])
+
+        count = swaps_per_day * days
+        pool_positions = random.integers(0, len(self.pools), count)
+        offer_a = random.random(count) < 0.5
+        a_denoms = np.array([pool[1] for pool in self.pools], dtype=object)[pool_positions]
+        b_denoms = np.array([pool[2] for pool in self.pools], dtype=object)[pool_positions]
+        base_prices = random.uniform(0.01, 100, len(self.pools))[pool_positions]
+        heights = np.sort(random.integers(1, self.last_height + 1, count))
+        self.swaps = {
+            'height': heights,
+            'msg_index': np.arange(count) - np.searchsorted(heights, heights),
+            'pool_id': pool_positions + 1,
+            'offer_coin_denom': np.where(offer_a, a_denoms, b_denoms),
+            'demand_coin_denom': np.where(offer_a, b_denoms, a_denoms),
+            'offer_coin_amount': random.integers(1000, 10 ** 9, count),
+            'exchanged_demand_coin_amount': random.integers(1000, 10 ** 9, count),
+            'swap_price': base_prices * random.uniform(0.9, 1.1, count),
+            'success': random.random(count) < 0.95,
+        }
+        self.swap_is_sell = offer_a
+        self.pool_swaps = {
+            pool_id: np.flatnonzero((self.swaps['pool_id'] == pool_id) & self.swaps['success'])
+            for pool_id, _, _ in self.pools
+        }
+
+    def advance(self, blocks=1):
+        self.tip = min(self.tip + blocks, self.last_height)
+        return self.tip
+
+    def get_swap_slice(self, from_height, to_height):
+        heights = self.swaps['height']
+        return np.searchsorted(heights, from_height, 'right'), np.searchsorted(heights, min(to_height, self.tip), 'right')
+
+    def get_ticker_id(self, pool_id):
+        _, a, b = self.pools[pool_id - 1]
+        return f'{a}_{b}'
+
+
+class SyntheticDBClient:
+    """
+    Stand-in for DBClient answering the query methods WarpService uses from a SyntheticMarket.
+    `latency` seconds are awaited before every answer to emulate ClickHouse round trips.
+    """
+
+    def __init__(self, market, latency=0):
+        self.market = market
+        self.latency = latency
+
+    async def wait(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_pairs_liquidity_pool(self, allowed_pool_ids):
+        await self.wait()
+        return [
+            Pair(a, b, pool_id, f'{a}_{b}') for pool_id, a, b in self.market.pools
+            if not allowed_pool_ids or pool_id in allowed_pool_ids
+        ]
+
+    async def get_base_for_tickers(self):
+        await self.wait()
+        swaps = self.market.swaps
+        result = []
+        for pool_id, a, b in self.market.pools:
+            positions = self.market.pool_swaps[pool_id]
+            positions = positions[swaps['height'][positions] <= self.market.tip]
+            last_price = float(swaps['swap_price'][positions[-1]]) if len(positions) else None
+            result.append(Ticker(
+                a, b, pool_id, f'{a}_{b}',
+                json.dumps({'denom': a, 'amount': 10 ** 12}), json.dumps({'denom': b, 'amount': 10 ** 12}),
+                last_price,
+            ))
+        return result
+
+    async def get_denom_traces(self):
+        await self.wait()
+        return list(self.market.denom_traces)
+
+    async def get_blocks_after_height(self, height):
+        await self.wait()
+        return self.market.blocks[height:self.market.tip]
+
+    async def get_blocks_after_timestamp(self, timestamp):
+        await self.wait()
+        timestamp = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+        return [block for block in self.market.blocks[:self.market.tip] if block.timestamp > timestamp]
+
+    async def get_height_after_timestamp(self, timestamp):
+        blocks = await self.get_blocks_after_timestamp(timestamp)
+        return Height(blocks[0].height) if blocks else None
+
+    async def get_swaps_between_heights(self, from_height, to_height):
+        await self.wait()
+        start, end = self.market.get_swap_slice(from_height, to_height)
+        return list(zip(*(column[start:end].tolist() for column in self.market.swaps.values())))
+
+    def get_trades(self, ticker_id, limit, offset, type, start_time, end_time, cursor):
+        market = self.market
+        pool_id = next((pool_id for pool_id, _, _ in market.pools if market.get_ticker_id(pool_id) == ticker_id), None)
+        if pool_id is None:
+            return []
+        positions = market.pool_swaps[pool_id]
+        heights = market.swaps['height'][positions]
+        mask = heights <= market.tip
+        if cursor:
+            mask &= (heights < cursor[0]) | ((heights == cursor[0]) & (market.swaps['msg_index'][positions] < cursor[1]))
+        if type:
+            mask &= market.swap_is_sell[positions] == (type == 'sell')
+        timestamps = market.block_timestamps[heights - 1]
+        if start_time:
+            mask &= timestamps > start_time
+        if end_time:
+            mask &= timestamps < end_time
+        positions = positions[mask][::-1][offset:offset + limit]
+        swaps = market.swaps
+        return [
+            (
+                int(swaps['msg_index'][position]),
+                int(market.block_timestamps[swaps['height'][position] - 1]),
+                'sell' if market.swap_is_sell[position] else 'buy',
+                int(swaps['offer_coin_amount'][position] if market.swap_is_sell[position] else swaps['exchanged_demand_coin_amount'][position]),
+                int(swaps['exchanged_demand_coin_amount'][position] if market.swap_is_sell[position] else swaps['offer_coin_amount'][position]),
+                float(swaps['swap_price'][position]),
+                int(swaps['height'][position]),
+                int(swaps['msg_index'][position]),
+            )
+            for position in positions
+        ]
+
+    async def get_historical_trades(self, ticker_id, limit, offset, type, start_time, end_time, cursor=None):
+        await self.wait()
+        return [
+            HistoricalTrade(id, timestamp, ticker_id, type, base_volume, target_volume, price, height, msg_index)
+            for id, timestamp, type, base_volume, target_volume, price, height, msg_index
+            in self.get_trades(ticker_id, limit, offset, type, start_time, end_time, cursor)
+        ]
+
+    async def get_spot_recent(self, ticker_id, limit, offset, type, start_time, end_time, cursor=None):
+        await self.wait()
+        return [SpotTrade(*trade) for trade in self.get_trades(ticker_id, limit, offset, type, start_time, end_time, cursor)]
+
+
+    async def get_historical_trades_batch(self, pool_ids, limit, type, start_time, end_time):
+        await self.wait()
+        result = []
+        for pool_id in sorted(pool_ids):
+            ticker_id = self.market.get_ticker_id(pool_id)
+            result += [
+                HistoricalTrade(id, timestamp, ticker_id, type, base_volume, target_volume, price, height, msg_index)
+                for id, timestamp, type, base_volume, target_volume, price, height, msg_index
+                in self.get_trades(ticker_id, limit, 0, type, start_time, end_time, None)
+            ]
+        return result
+
+    async def get_candles(self, seconds, start_time, end_time, to_height, pool_id, name='get_candles'):
+        await self.wait()
+        market = self.market
+        swaps = market.swaps
+        candles = {}
+        for position in range(*market.get_swap_slice(0, to_height or market.tip)):
+            timestamp = int(market.block_timestamps[swaps['height'][position] - 1])
+            if not swaps['success'][position] or (pool_id and swaps['pool_id'][position] != pool_id):
+                continue
+            if (start_time and timestamp < start_time) or (end_time and timestamp >= end_time):
+                continue
+            price = float(swaps['swap_price'][position])
+            offer, demand = int(swaps['offer_coin_amount'][position]), int(swaps['exchanged_demand_coin_amount'][position])
+            base_volume, quote_volume = (offer, demand) if market.swap_is_sell[position] else (demand, offer)
+            key = (int(swaps['pool_id'][position]), timestamp // seconds * seconds)
+            candle = candles.get(key)
+            if candle is None:
+                candles[key] = [price, price, price, price, base_volume, quote_volume]
+            else:
+                candle[1] = max(candle[1], price)
+                candle[2] = min(candle[2], price)
+                candle[3] = price
+                candle[4] += base_volume
+                candle[5] += quote_volume
+        return [Candle(*key, *candle) for key, candle in sorted(candles.items())]
+
+    async def stream_trades_export(self, ticker_id, start_time, end_time, block_size=1000):
+        await self.wait()
+        trades = self.get_trades(ticker_id, len(self.market.swap_is_sell), 0, '', start_time and start_time - 1, end_time, None)
+        trades.reverse()
+        for start in range(0, len(trades), block_size):
+            yield [
+                (id, timestamp, height, type, base_volume, target_volume, price)
+                for id, timestamp, type, base_volume, target_volume, price, height, _ in trades[start:start + block_size]
+            ]
+
+
+class SyntheticApiClient:
+    """
+    Stand-in for BronbroApiClient with a fixed ATOM price.
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+
+    async def get_exchange_rates(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [{'symbol': 'ATOM', 'price': 10.0}]
@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.synthetic_market import SyntheticApiClient, SyntheticDBClient, SyntheticMarket
+from services.block_index import BlockHeightIndex
+from services.market_snapshot import MarketSnapshotStore
+from services.swap_window import RollingSwapWindow
+from services.warp_service import WarpService
+
+
+# median milliseconds at the default scale, generous enough for a loaded CI machine
+THRESHOLDS_MS = {
+    'get_tickers cold': 250,
+    'get_tickers next_block': 20,
+    'get_spot_summary cold': 400,
+    'get_spot_summary next_block': 200,
+    'get_spot_ticker cold': 400,
+    'get_spot_ticker next_block': 200,
+    'get_24_volume_usd cold': 250,
+    'get_24_volume_usd next_block': 20,
+    'get_historical_trades': 10,
+}
+
+CASES = [
+    ('get_tickers', (False,)),
+    ('get_spot_summary', (False,)),
+    ('get_spot_ticker', (False,)),
+    ('get_24_volume_usd', ()),
+]
+
+
+def reset_views(cold):
+    for name, _ in CASES:
+        getattr(WarpService, name).cache.clear()
+    MarketSnapshotStore().snapshot = None
+    if cold:
+        RollingSwapWindow().reset()
+
+
+async def measure(call, before, repeat):
+    timings = []
+    for _ in range(repeat):
+        await before()
+        started = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def run(args):
+    market = SyntheticMarket(args.pools, args.denoms, args.swaps_per_day, args.days, args.repeat * (len(CASES) + 1))
+    service = WarpService()
+    service.db_client = SyntheticDBClient(market)
+    service.bronbro_api_client = SyntheticApiClient()
+    await BlockHeightIndex().sync(service.db_client)
+
+    results = {}
+    for name, method_args in CASES:
+        method = getattr(service, name)
+
+        async def cold():
+            reset_views(True)
+
+        async def advance():
+            market.advance()
+            BlockHeightIndex().synced_at = 0
+            reset_views(False)
+
+        results[f'{name} cold'] = await measure(lambda: method(*method_args), cold, args.repeat)
+        await method(*method_args)
+        results[f'{name} next_block'] = await measure(lambda: method(*method_args), advance, args.repeat)
+
+    ticker_ids = [market.get_ticker_id(pool_id) for pool_id, _, _ in market.pools]
+    positions = iter(range(args.repeat))
+
+    async def nothing():
+        pass
+
+    results['get_historical_trades'] = await measure(
+        lambda: service.get_historical_trades(ticker_ids[next(positions) % len(ticker_ids)], 100, 0, '', 0, 0),
+        nothing, args.repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time WarpService hot paths against synthetic data, offline.')
+    parser.add_argument('--pools', type=int, default=40)
+    parser.add_argument('--denoms', type=int, default=25)
+    parser.add_argument('--swaps-per-day', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--thresholds', help='JSON file with median millisecond limits per benchmark')
+    parser.add_argument('--no-check', action='store_true', help='report only, never fail')
+    args = parser.parse_args()
+
+    thresholds = dict(THRESHOLDS_MS)
+    if args.thresholds:
+        with open(args.thresholds) as file:
+            thresholds.update(json.load(file))
+
+    results = asyncio.run(run(args))
+    print(f'pools={args.pools} denoms={args.denoms} swaps_per_day={args.swaps_per_day} days={args.days} repeat={args.repeat}')
+    print(f'{"benchmark":<32}{"median ms":>12}{"min ms":>10}{"max ms":>10}{"limit ms":>10}')
+    failed = []
+    for name, timings in results.items():
+        median = statistics.median(timings)
+        limit = thresholds.get(name)
+        status = ''
+        if limit is not None and median > limit:
+            failed.append(name)
+            status = '  REGRESSION'
+        print(f'{name:<32}{median:>12.2f}{min(timings):>10.2f}{max(timings):>10.2f}{limit if limit is not None else "-":>10}{status}')
+    if failed and not args.no_check:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
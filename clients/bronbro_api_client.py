@@ -1,22 +1,72 @@
 import asyncio
+import time
 
-import requests
+import httpx
 
-from common.decorators import response_decorator
+from common.circuit_breaker import CircuitBreaker
+from common.decorators import response_decorator, swr_cache
+from common.metrics import RPC_DURATION
 from config import PRICE_FEED_API
 from typing import Optional, List
 from urllib.parse import urljoin
 
 
+class PriceFeedUnavailableError(RuntimeError):
+    pass
+
+
 class BronbroApiClient:
+    http_client = None
+    exchange_rates_breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    last_exchange_rates = None
 
     def __init__(self):
         self.price_feed_api_url = PRICE_FEED_API
 
+    @classmethod
+    def get_http_client(cls):
+        if cls.http_client is None:
+            cls.http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(3.0),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+                transport=httpx.AsyncHTTPTransport(retries=2),
+            )
+        return cls.http_client
+
+    @classmethod
+    async def close(cls):
+        if cls.http_client is not None:
+            await cls.http_client.aclose()
+            cls.http_client = None
+
     @response_decorator
-    def rpc_get(self, url):
-        url = urljoin(self.price_feed_api_url, url)
-        return requests.get(url)
+    async def rpc_get(self, url):
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = await self.get_http_client().get(urljoin(self.price_feed_api_url, url))
+            status = str(response.status_code)
+            return response
+        finally:
+            RPC_DURATION.labels(url, status).observe(time.perf_counter() - start)
+
+    def get_last_exchange_rates(self):
+        # raising keeps a failed cold fetch out of the cache, so the next call asks the feed again
+        if BronbroApiClient.last_exchange_rates is None:
+            raise PriceFeedUnavailableError('Price feed is unavailable')
+        return BronbroApiClient.last_exchange_rates
 
-    def get_exchange_rates(self) -> List[dict]:
-        return self.rpc_get('price_feed_api/tokens/')
+    @swr_cache(ttl=30, maxsize=1)
+    async def get_exchange_rates(self) -> List[dict]:
+        if self.exchange_rates_breaker.is_open():
+            return self.get_last_exchange_rates()
+        try:
+            exchange_rates = await self.rpc_get('price_feed_api/tokens/')
+        except httpx.HTTPError:
+            exchange_rates = None
+        if exchange_rates is None:
+            self.exchange_rates_breaker.record_failure()
+            return self.get_last_exchange_rates()
+        self.exchange_rates_breaker.record_success()
+        BronbroApiClient.last_exchange_rates = exchange_rates
+        return exchange_rates
@@ -1,18 +1,60 @@
+import asyncio
+import re
+import time
+import uuid
 from datetime import timedelta, datetime
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 
 import clickhouse_connect
+from clickhouse_connect.driver.exceptions import DatabaseError
 
 from common.db_connector import DBConnector
 from collections import namedtuple
 
+from common.deadline import QueryBudgetExceededError, get_remaining_seconds
 from common.decorators import get_first_if_exists
+from common.metrics import QUERY_ERRORS, observe_query, observe_read
+
+
+HISTORICAL_TRADES_COLUMNS = """
+                msg_index as id,
+                toUnixTimestamp(b.timestamp) as trade_timestamp, 
+                ticker_id,
+                if(offer_coin_denom = a_denom, 'sell', 'buy') as type,
+                if(offer_coin_denom = a_denom, offer_coin_amount, exchanged_demand_coin_amount) as base_volume,
+                if(offer_coin_denom = b_denom, offer_coin_amount, exchanged_demand_coin_amount) as target_volume,
+                swap_price as price"""
+
+DEFAULT_QUERY_BUDGET = {
+    'max_execution_time': 30,
+    'max_memory_usage': 2 * 1024 ** 3,
+}
+
+QUERY_BUDGETS = {
+    'get_historical_trades': {'max_execution_time': 10, 'max_rows_to_read': 500_000_000},
+    'get_spot_recent': {'max_execution_time': 10, 'max_rows_to_read': 500_000_000},
+    'get_historical_trades_batch': {'max_execution_time': 15, 'max_rows_to_read': 500_000_000},
+    'get_candles': {'max_execution_time': 20},
+    'backfill_candles': {'max_execution_time': 600},
+    'reconcile_candles': {'max_execution_time': 60},
+    'get_height_after_timestamp': {'max_execution_time': 5},
+    'get_blocks_after_height': {'max_execution_time': 5},
+    'stream_trades_export': {'max_execution_time': 600, 'max_memory_usage': 1024 ** 3},
+}
+
+# TIMEOUT_EXCEEDED, TOO_MANY_ROWS, TOO_MANY_BYTES, MEMORY_LIMIT_EXCEEDED
+BUDGET_ERROR_CODES = {159, 158, 307, 241}
+
+# streamed responses carry no final X-ClickHouse-Summary, rows and bytes read come from system.query_log
+# once it has been flushed (flush_interval_milliseconds is 7.5s by default)
+QUERY_LOG_DELAY = 10
 
 
 class DBClient:
+    record_classes = {}
 
     def __init__(self):
-        self.connection = DBConnector().clickhouse_client
+        self.connector = DBConnector()
 
     def fix_column_names(self, column_names: List[str]) -> List[str]:
         res = []
@@ -21,23 +63,129 @@ class DBClient:
             res.append(new_column_name)
         return res
 
-    def make_query(self, query: str) -> List[namedtuple]:
-        query = self.connection.query(query)
-        Record = namedtuple("Record", self.fix_column_names(query.column_names))
+    def get_record_class(self, column_names: Tuple[str]):
+        if column_names not in self.record_classes:
+            self.record_classes[column_names] = namedtuple("Record", self.fix_column_names(column_names))
+        return self.record_classes[column_names]
+
+    def get_query_settings(self, name, settings):
+        settings = dict(DEFAULT_QUERY_BUDGET, **QUERY_BUDGETS.get(name, {}), **(settings or {}))
+        remaining = get_remaining_seconds()
+        if remaining is not None:
+            settings['max_execution_time'] = min(settings['max_execution_time'], remaining)
+        settings['query_id'] = f'warp-{name}-{uuid.uuid4().hex}'
+        return settings
+
+    def check_budget_error(self, name, error):
+        code = re.search(r'Code: (\d+)', str(error))
+        if code and int(code.group(1)) in BUDGET_ERROR_CODES:
+            raise QueryBudgetExceededError(f'{name} exceeded its query budget') from error
+
+    async def kill_query(self, query_id):
+        try:
+            await self.connector.command(f"KILL QUERY WHERE query_id = '{query_id}' ASYNC")
+        except Exception:
+            pass
+
+    async def run_in_thread(self, query_id, func, *args, **kwargs):
+        """
+        Runs a blocking client call in a thread. When cancelled, kills the query and waits for the call
+        to return, so the connection is never released or closed while the thread is still using it.
+        """
+        future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            asyncio.ensure_future(self.kill_query(query_id))
+            await asyncio.wait([future])
+            if not future.cancelled():
+                future.exception()
+            raise
+
+    async def run_query(self, name, query, settings, parameters=None):
+        settings = self.get_query_settings(name, settings)
+        start = time.perf_counter()
+        try:
+            async with self.connector.connection() as connection:
+                result = await self.run_in_thread(
+                    settings['query_id'], connection.query, query, parameters=parameters, settings=settings)
+        except DatabaseError as e:
+            QUERY_ERRORS.labels(name).inc()
+            self.check_budget_error(name, e)
+            raise
+        except Exception:
+            QUERY_ERRORS.labels(name).inc()
+            raise
+        return result, time.perf_counter() - start
+
+    async def make_query(self, query: str, name: str, settings: Optional[Dict] = None, parameters: Optional[Dict] = None) -> List[namedtuple]:
+        query, elapsed = await self.run_query(name, query, settings, parameters)
+        Record = self.get_record_class(tuple(query.column_names))
         result = [Record(*item) for item in query.result_rows]
+        observe_query(name, elapsed, getattr(query, 'summary', None), len(result))
+        return result
+
+    async def make_row_query(self, query: str, name: str, settings: Optional[Dict] = None) -> List[tuple]:
+        query, elapsed = await self.run_query(name, query, settings)
+        result = query.result_rows
+        observe_query(name, elapsed, getattr(query, 'summary', None), len(result))
         return result
 
-    def get_pairs_liquidity_pool(self, allowed_pool_ids):
+    async def stream_query(self, query: str, name: str, settings: Optional[Dict] = None, parameters: Optional[Dict] = None):
+        settings = self.get_query_settings(name, settings)
+        start = time.perf_counter()
+        rows = 0
+        try:
+            async with self.connector.connection() as connection:
+                stream = await self.run_in_thread(
+                    settings['query_id'], connection.query_row_block_stream, query, parameters=parameters, settings=settings)
+                with stream:
+                    blocks = iter(stream)
+                    while True:
+                        block = await self.run_in_thread(settings['query_id'], next, blocks, None)
+                        if block is None:
+                            break
+                        rows += len(block)
+                        yield block
+        except GeneratorExit:
+            # closed by the consumer between blocks, no read is pending but the query may still be running
+            asyncio.ensure_future(self.kill_query(settings['query_id']))
+            raise
+        except DatabaseError as e:
+            QUERY_ERRORS.labels(name).inc()
+            self.check_budget_error(name, e)
+            raise
+        except Exception:
+            QUERY_ERRORS.labels(name).inc()
+            raise
+        finally:
+            observe_query(name, time.perf_counter() - start, None, rows)
+            asyncio.ensure_future(self.observe_stream_read(name, settings['query_id']))
+
+    async def observe_stream_read(self, name, query_id):
+        await asyncio.sleep(QUERY_LOG_DELAY)
+        try:
+            result = await self.make_query("""
+                SELECT read_rows, read_bytes FROM system.query_log
+                WHERE event_date >= yesterday() AND query_id = {query_id:String} AND type != 'QueryStart'
+                LIMIT 1
+            """, name='get_query_log', parameters={'query_id': query_id})
+        except Exception:
+            return
+        if result:
+            observe_read(name, result[0]._asdict())
+
+    async def get_pairs_liquidity_pool(self, allowed_pool_ids):
         filter = ''
         if allowed_pool_ids:
             filter = f'WHERE pool_id IN ({", ".join(map(str, allowed_pool_ids))})'
-        return self.make_query(f"""
+        return await self.make_query(f"""
             SELECT a_denom AS base, b_denom AS target, pool_id, CONCAT(a_denom, '_',  b_denom) AS ticker_id  FROM spacebox.liquidity_pool FINAL
             {filter}
-        """)
+        """, name='get_pairs_liquidity_pool')
 
-    def get_base_for_tickers(self):
-        return self.make_query(f"""
+    async def get_base_for_tickers(self):
+        return await self.make_query(f"""
             SELECT 
                 a_denom AS base_currency, 
                 b_denom AS target_currency, 
@@ -56,257 +204,176 @@ class DBClient:
                 ) 
                 where ROWNUM = 1
             ) as s on s.pool_id = lp.pool_id
-        """)
+        """, name='get_base_for_tickers')
 
-    def get_denom_traces(self):
-        return self.make_query(f"""
+    async def get_denom_traces(self):
+        return await self.make_query(f"""
             select * from spacebox.denom_trace FINAL
-        """)
+        """, name='get_denom_traces')
+
+    async def get_blocks_after_height(self, height):
+        return await self.make_query(f"""
+            select height, `timestamp` from spacebox.block FINAL where height > {height} order by height ASC
+        """, name='get_blocks_after_height')
+
+    async def get_blocks_after_timestamp(self, timestamp):
+        return await self.make_query(f"""
+            select height, `timestamp` from spacebox.block FINAL where `timestamp` > '{timestamp}' order by height ASC
+        """, name='get_blocks_after_timestamp')
 
     @get_first_if_exists
-    def get_height_after_timestamp(self, timestamp):
-        return self.make_query(f"""
+    async def get_height_after_timestamp(self, timestamp):
+        return await self.make_query(f"""
             select height from spacebox.block FINAL where `timestamp` > '{timestamp}' order by height ASC LIMIT 1
-        """)
+        """, name='get_height_after_timestamp')
 
-    def get_offer_coins_volume(self, height):
-        return self.make_query(f"""
-            select 
-                pool_id, 
-                offer_coin_denom, 
-                sum(offer_coin_amount) as sum 
-            from spacebox.swap FINAL 
-            where height > {height} 
-            and success = 1
-            GROUP by pool_id, offer_coin_denom 
-        """)
+    async def get_candles(self, seconds, start_time, end_time, to_height, pool_id, name='get_candles'):
+        timestamp_filter = ' AND '.join(filter(None, [
+            f"toUnixTimestamp(`timestamp`) >= {start_time}" if start_time else '',
+            f"toUnixTimestamp(`timestamp`) < {end_time}" if end_time else '',
+        ])) or '1'
+        # the joins do not narrow the swap scan, so pool and heights are filtered on the swap table itself
+        swap_filter = ''.join([
+            f' AND s.height <= {to_height}' if to_height else '',
+            f' AND s.pool_id = {pool_id}' if pool_id else '',
+            f' AND s.height IN (select height from spacebox.block FINAL where {timestamp_filter})' if start_time or end_time else '',
+        ])
+        pool_filter = f'WHERE pool_id = {pool_id}' if pool_id else ''
+        return await self.make_query(f"""
+            SELECT 
+                s.pool_id AS pool_id,
+                intDiv(toUnixTimestamp(b.timestamp), {seconds}) * {seconds} AS bucket,
+                argMin(s.swap_price, (s.height, s.msg_index)) AS open,
+                max(s.swap_price) AS high,
+                min(s.swap_price) AS low,
+                argMax(s.swap_price, (s.height, s.msg_index)) AS close,
+                sum(if(s.offer_coin_denom = lp.a_denom, s.offer_coin_amount, s.exchanged_demand_coin_amount)) AS base_volume,
+                sum(if(s.offer_coin_denom = lp.a_denom, s.exchanged_demand_coin_amount, s.offer_coin_amount)) AS quote_volume
+            FROM spacebox.swap AS s FINAL
+            INNER JOIN (
+                SELECT pool_id, a_denom FROM spacebox.liquidity_pool FINAL {pool_filter}
+            ) AS lp ON lp.pool_id = s.pool_id
+            INNER JOIN (
+                select height, `timestamp` from spacebox.block FINAL where {timestamp_filter}
+            ) AS b ON b.height = s.height
+            WHERE s.success = True{swap_filter}
+            GROUP BY pool_id, bucket
+            ORDER BY pool_id ASC, bucket ASC
+        """, name=name)
 
-    def get_demand_coins_volume(self, height):
-        return self.make_query(f"""
+    async def get_swaps_between_heights(self, from_height, to_height):
+        return await self.make_row_query(f"""
             select 
+                height, 
+                msg_index, 
                 pool_id, 
+                offer_coin_denom, 
                 demand_coin_denom, 
-                sum(exchanged_demand_coin_amount) as sum 
+                offer_coin_amount, 
+                exchanged_demand_coin_amount, 
+                swap_price, 
+                success 
             from spacebox.swap FINAL 
-            where height > {height} 
-            and success = 1
-            GROUP by pool_id, demand_coin_denom  
-        """)
+            where height > {from_height} and height <= {to_height}
+            order by height ASC, msg_index ASC
+        """, name='get_swaps_between_heights')
 
-    def build_filter_for_historical_trades(self, type, start_time, end_time):
+    def build_filter_for_historical_trades(self, type, start_time, end_time, cursor):
         filter_string = ''
-        if type:
-            filter_string = f"WHERE type = '{type}'"
-        if start_time:
-            filter_string = f"{filter_string} AND trade_timestamp > {start_time}" if filter_string else f"WHERE trade_timestamp > {start_time}"
-        if end_time:
-            filter_string = f"{filter_string} AND trade_timestamp < {end_time}" if filter_string else f"WHERE trade_timestamp < {end_time}"
+        if cursor:
+            filter_string = f"{filter_string} AND (s.height, s.msg_index) < ({cursor[0]}, {cursor[1]})"
+        if type == 'sell':
+            filter_string = f"{filter_string} AND s.offer_coin_denom = lp.a_denom"
+        elif type == 'buy':
+            filter_string = f"{filter_string} AND s.offer_coin_denom != lp.a_denom"
+        elif type:
+            filter_string = f"{filter_string} AND 0"
+        if start_time or end_time:
+            timestamp_filter = ' AND '.join(filter(None, [
+                f"toUnixTimestamp(`timestamp`) > {start_time}" if start_time else '',
+                f"toUnixTimestamp(`timestamp`) < {end_time}" if end_time else '',
+            ]))
+            filter_string = f"{filter_string} AND s.height IN (select height from spacebox.block FINAL where {timestamp_filter})"
         return filter_string
 
-    def get_historical_trades(self, ticker_id, limit, offset, type, start_time, end_time):
-        return self.make_query(f"""
+    async def get_trades(self, name, columns, ticker_id, limit, offset, type, start_time, end_time, cursor):
+        return await self.make_query(f"""
             select 
-                msg_index as id,
-                toUnixTimestamp(b.timestamp) as trade_timestamp, 
-                ticker_id,
-                if(offer_coin_denom = a_denom, 'sell', 'buy') as type,
-                if(offer_coin_denom = a_denom, offer_coin_amount, exchanged_demand_coin_amount) as base_volume,
-                if(offer_coin_denom = b_denom, offer_coin_amount, exchanged_demand_coin_amount) as target_volume,
-                swap_price as price
+                {columns},
+                d.height as height,
+                d.msg_index as msg_index
             from (
-                SELECT s.*, pool_id, CONCAT(a_denom, '_',  b_denom) as ticker_id, a_denom , b_denom  
-                FROM spacebox.liquidity_pool as lp FINAL
-                LEFT JOIN (select * from spacebox.swap FINAL) as s on s.pool_id = lp.pool_id
-                where ticker_id = '{ticker_id}' and s.success = True order by height DESC LIMIT {limit} OFFSET {offset}
+                SELECT s.*, lp.ticker_id AS ticker_id, lp.a_denom AS a_denom, lp.b_denom AS b_denom
+                FROM spacebox.swap AS s FINAL
+                INNER JOIN (
+                    SELECT pool_id, CONCAT(a_denom, '_',  b_denom) AS ticker_id, a_denom, b_denom
+                    FROM spacebox.liquidity_pool FINAL
+                    WHERE ticker_id = {{ticker_id:String}}
+                ) AS lp ON lp.pool_id = s.pool_id
+                WHERE s.success = True {self.build_filter_for_historical_trades(type, start_time, end_time, cursor)}
+                ORDER BY s.height DESC, s.msg_index DESC LIMIT {limit} OFFSET {offset}
             ) as d
-            left join (select * from spacebox.block FINAL) as b on d.height = b.height
-            {self.build_filter_for_historical_trades(type, start_time, end_time)}
-        """)
+            left join (select height, `timestamp` from spacebox.block FINAL) as b on d.height = b.height
+            ORDER BY d.height DESC, d.msg_index DESC
+        """, name=name, parameters={'ticker_id': ticker_id})
+
+    async def get_historical_trades(self, ticker_id, limit, offset, type, start_time, end_time, cursor=None):
+        return await self.get_trades('get_historical_trades', HISTORICAL_TRADES_COLUMNS, ticker_id, limit, offset, type, start_time, end_time, cursor)
 
-    def get_spot_recent(self, ticker_id, limit, offset, type, start_time, end_time):
-        return self.make_query(f"""
+    async def get_historical_trades_batch(self, pool_ids, limit, type, start_time, end_time):
+        pool_filter = ", ".join(map(str, pool_ids))
+        return await self.make_query(f"""
             select 
+                {HISTORICAL_TRADES_COLUMNS},
+                d.height as height,
+                d.msg_index as msg_index
+            from (
+                SELECT s.*, lp.ticker_id AS ticker_id, lp.a_denom AS a_denom, lp.b_denom AS b_denom
+                FROM spacebox.swap AS s FINAL
+                INNER JOIN (
+                    SELECT pool_id, CONCAT(a_denom, '_',  b_denom) AS ticker_id, a_denom, b_denom
+                    FROM spacebox.liquidity_pool FINAL
+                    WHERE pool_id IN ({pool_filter})
+                ) AS lp ON lp.pool_id = s.pool_id
+                WHERE s.success = True AND s.pool_id IN ({pool_filter}) {self.build_filter_for_historical_trades(type, start_time, end_time, None)}
+                ORDER BY s.height DESC, s.msg_index DESC LIMIT {limit} BY s.pool_id
+            ) as d
+            left join (select height, `timestamp` from spacebox.block FINAL) as b on d.height = b.height
+            ORDER BY d.pool_id, d.height DESC, d.msg_index DESC
+        """, name='get_historical_trades_batch')
+
+    async def get_spot_recent(self, ticker_id, limit, offset, type, start_time, end_time, cursor=None):
+        return await self.get_trades('get_spot_recent', """
                 msg_index as trade_id,
                 toUnixTimestamp(b.timestamp) as timestamp, 
                 if(offer_coin_denom = a_denom, 'sell', 'buy') as type,
                 if(offer_coin_denom = a_denom, offer_coin_amount, exchanged_demand_coin_amount) as base_volume,
                 if(offer_coin_denom = b_denom, offer_coin_amount, exchanged_demand_coin_amount) as quote_volume,
-                swap_price as price
-            from (
-                SELECT s.*, pool_id, CONCAT(a_denom, '_',  b_denom) as ticker_id, a_denom , b_denom  
-                FROM spacebox.liquidity_pool as lp FINAL
-                LEFT JOIN (select * from spacebox.swap FINAL) as s on s.pool_id = lp.pool_id
-                where ticker_id = '{ticker_id}' and s.success = True order by height DESC LIMIT {limit} OFFSET {offset}
-            ) as d
-            left join (select * from spacebox.block FINAL) as b on d.height = b.height
-            {self.build_filter_for_historical_trades(type, start_time, end_time)}
-        """)
-    def get_spot_summary(self, height, allowed_pool_ids):
-        filter = ''
-        if allowed_pool_ids:
-            filter = f'WHERE pool_id IN ({", ".join(map(str, allowed_pool_ids))})'
-        return self.make_query(f"""
-            SELECT DISTINCT *
-            FROM
-              (SELECT b.pool_id AS pool_id,
-                      CONCAT(a_denom, '_', b_denom) AS trading_pairs,
-                      lp_t.last_price AS last_price,
-                      min_max.lowest_price_24h AS lowest_price_24h,
-                      min_max.highest_price_24h AS highest_price_24h,
-                      fp.first_price AS first_price,
-                      volumes.base_volume AS base_volume,
-                      volumes.quote_volume AS quote_volume,
-                      hb.highest_bid AS highest_bid,
-                      la.lowest_ask AS lowest_ask
-               FROM spacebox.liquidity_pool AS b
-               LEFT JOIN
-                 (SELECT pool_id,
-                         swap_price AS last_price
-                  FROM
-                    (SELECT *,
-                            RANK () OVER (PARTITION BY pool_id
-                                          ORDER BY height DESC) AS custon_rank
-                     FROM spacebox.swap
-                     WHERE height > {height})
-                  WHERE custon_rank = 1 ) AS lp_t ON b.pool_id = lp_t.pool_id
-               LEFT JOIN
-                 (SELECT pool_id,
-                         min(swap_price) AS lowest_price_24h,
-                         max(swap_price) AS highest_price_24h
-                  FROM spacebox.swap
-                  WHERE height > {height}
-                  GROUP BY pool_id) AS min_max ON min_max.pool_id = b.pool_id
-               LEFT JOIN
-                 (SELECT pool_id,
-                         swap_price AS first_price
-                  FROM
-                    (SELECT *,
-                            RANK () OVER (PARTITION BY pool_id
-                                          ORDER BY height ASC) AS custon_rank
-                     FROM spacebox.swap
-                     WHERE height > {height} )
-                  WHERE custon_rank = 1 ) AS fp ON fp.pool_id = b.pool_id
-               LEFT JOIN
-                 (SELECT sum(base_volume) AS base_volume,
-                         sum(target_volume) AS quote_volume,
-                         pool_id
-                  FROM
-                    (SELECT pool_id,
-                            if(offer_coin_denom = a_denom, offer_coin_amount, exchanged_demand_coin_amount) AS base_volume,
-                            if(offer_coin_denom = b_denom, offer_coin_amount, exchanged_demand_coin_amount) AS target_volume
-                     FROM
-                       (SELECT s.*,
-                               pool_id,
-                               CONCAT(a_denom, '_', b_denom) AS ticker_id,
-                               a_denom,
-                               b_denom
-                        FROM spacebox.liquidity_pool AS lp FINAL
-                        LEFT JOIN
-                          (SELECT *
-                           FROM spacebox.swap FINAL) AS s ON s.pool_id = lp.pool_id
-                        WHERE s.success = TRUE
-                          AND s.height > {height} ))
-                  GROUP BY pool_id) AS volumes ON volumes.pool_id = b.pool_id
-               LEFT JOIN
-                 (SELECT max(price) AS highest_bid,
-                         pool_id
-                  FROM
-                    (SELECT pool_id,
-                            if(offer_coin_denom = a_denom, 'sell', 'buy') AS TYPE,
-                            swap_price AS price
-                     FROM
-                       (SELECT s.*,
-                               pool_id,
-                               a_denom,
-                               b_denom
-                        FROM spacebox.liquidity_pool AS lp FINAL
-                        LEFT JOIN
-                          (SELECT *
-                           FROM spacebox.swap FINAL) AS s ON s.pool_id = lp.pool_id
-                        WHERE s.success = TRUE
-                          AND s.height > {height} )
-                     WHERE TYPE = 'sell' )
-                  GROUP BY pool_id) AS hb ON hb.pool_id = b.pool_id
-               LEFT JOIN
-                 (SELECT min(price) AS lowest_ask,
-                         pool_id
-                  FROM
-                    (SELECT pool_id,
-                            if(offer_coin_denom = a_denom, 'sell', 'buy') AS TYPE,
-                            swap_price AS price
-                     FROM
-                       (SELECT s.*,
-                               pool_id,
-                               a_denom,
-                               b_denom
-                        FROM spacebox.liquidity_pool AS lp FINAL
-                        LEFT JOIN
-                          (SELECT *
-                           FROM spacebox.swap FINAL) AS s ON s.pool_id = lp.pool_id
-                        WHERE s.success = TRUE
-                          AND s.height > {height} )
-                     WHERE TYPE = 'buy' )
-                  GROUP BY pool_id) AS la ON la.pool_id = b.pool_id)
-                  {filter}
-        """)
-
-    def get_spot_ticker(self, height, allowed_pool_ids):
-        filter = ''
-        if allowed_pool_ids:
-            filter = f'WHERE pool_id IN ({", ".join(map(str, allowed_pool_ids))})'
-        return self.make_query(f"""
-            SELECT DISTINCT *
-            FROM
-              (SELECT b.pool_id AS pool_id,
-                      CONCAT(a_denom, '_', b_denom) AS trading_pairs,
-                      lp_t.last_price AS last_price,
-                      volumes.base_volume AS base_volume,
-                      volumes.quote_volume AS quote_volume
-               FROM spacebox.liquidity_pool AS b
-               LEFT JOIN
-                 (SELECT pool_id,
-                         swap_price AS last_price
-                  FROM
-                    (SELECT *,
-                            RANK () OVER (PARTITION BY pool_id
-                                          ORDER BY height DESC) AS custon_rank
-                     FROM spacebox.swap
-                     WHERE height > {height})
-                  WHERE custon_rank = 1 ) AS lp_t ON b.pool_id = lp_t.pool_id
-               LEFT JOIN
-                 (SELECT sum(base_volume) AS base_volume,
-                         sum(target_volume) AS quote_volume,
-                         pool_id
-                  FROM
-                    (SELECT pool_id,
-                            if(offer_coin_denom = a_denom, offer_coin_amount, exchanged_demand_coin_amount) AS base_volume,
-                            if(offer_coin_denom = b_denom, offer_coin_amount, exchanged_demand_coin_amount) AS target_volume
-                     FROM
-                       (SELECT s.*,
-                               pool_id,
-                               CONCAT(a_denom, '_', b_denom) AS ticker_id,
-                               a_denom,
-                               b_denom
-                        FROM spacebox.liquidity_pool AS lp FINAL
-                        LEFT JOIN
-                          (SELECT *
-                           FROM spacebox.swap FINAL) AS s ON s.pool_id = lp.pool_id
-                        WHERE s.success = TRUE
-                          AND s.height > {height} ))
-                  GROUP BY pool_id) AS volumes ON volumes.pool_id = b.pool_id
-            )
-            {filter}
-        """)
+                swap_price as price""", ticker_id, limit, offset, type, start_time, end_time, cursor)
 
-    def get_last_24_hours_volume_pairs(self, height, allowed_pool_ids):
-        filter = f'({", ".join(map(str, allowed_pool_ids))})'
-        return self.make_query(f"""
+    def stream_trades_export(self, ticker_id, start_time, end_time):
+        timestamp_filter = ' AND '.join(filter(None, [
+            f"toUnixTimestamp(`timestamp`) >= {start_time}" if start_time else '',
+            f"toUnixTimestamp(`timestamp`) < {end_time}" if end_time else '',
+        ])) or '1'
+        return self.stream_query(f"""
             select 
-                offer_coin_denom as base_currency, 
-                demand_coin_denom as target_currency, 
-                sum(offer_coin_amount) as base_volume, 
-                sum(exchanged_demand_coin_amount) as target_volume 
-            from spacebox.swap
-            where height  > {height} and success = TRUE and pool_id in {filter}
-            group by offer_coin_denom , demand_coin_denom
-        """)
+                s.msg_index as id,
+                toUnixTimestamp(b.timestamp) as trade_timestamp, 
+                s.height as height,
+                if(s.offer_coin_denom = lp.a_denom, 'sell', 'buy') as type,
+                if(s.offer_coin_denom = lp.a_denom, s.offer_coin_amount, s.exchanged_demand_coin_amount) as base_volume,
+                if(s.offer_coin_denom = lp.b_denom, s.offer_coin_amount, s.exchanged_demand_coin_amount) as target_volume,
+                s.swap_price as price
+            FROM spacebox.swap AS s FINAL
+            INNER JOIN (
+                SELECT pool_id, a_denom, b_denom
+                FROM spacebox.liquidity_pool FINAL
+                WHERE CONCAT(a_denom, '_',  b_denom) = {{ticker_id:String}}
+            ) AS lp ON lp.pool_id = s.pool_id
+            INNER JOIN (
+                select height, `timestamp` from spacebox.block FINAL where {timestamp_filter}
+            ) AS b ON b.height = s.height
+            WHERE s.success = True
+            ORDER BY s.height ASC, s.msg_index ASC
+        """, settings={'max_threads': 2}, name='stream_trades_export', parameters={'ticker_id': ticker_id})
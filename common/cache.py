@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from common.metrics import CACHE_REQUESTS
+
+
+logger = logging.getLogger(__name__)
+
+
+class StaleWhileRevalidateCache:
+    """
+    Values older than `ttl` are served while one background refresh runs. Once a value is older
+    than `ttl + max_stale` (default ten ttls) it is dropped and the next call loads it again, so a
+    refresh that keeps failing surfaces as an error instead of stale data served forever.
+    """
+
+    def __init__(self, ttl, maxsize, name='cache', max_stale=None):
+        self.ttl = ttl
+        self.max_stale = ttl * 10 if max_stale is None else max_stale
+        self.name = name
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.refreshing = {}
+
+    async def get(self, key, loader):
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] + self.max_stale <= time.monotonic():
+            del self.entries[key]
+            entry = None
+        if entry is not None:
+            self.entries.move_to_end(key)
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                CACHE_REQUESTS.labels(self.name, 'stale').inc()
+                if key not in self.refreshing:
+                    self.refreshing[key] = asyncio.ensure_future(self.refresh(key, loader))
+            else:
+                CACHE_REQUESTS.labels(self.name, 'hit').inc()
+            return value
+        CACHE_REQUESTS.labels(self.name, 'miss').inc()
+        value = await loader()
+        self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.entries[key] = (value, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    async def refresh(self, key, loader):
+        try:
+            self.set(key, await loader())
+        except Exception:
+            CACHE_REQUESTS.labels(self.name, 'refresh_error').inc()
+            logger.exception('Refreshing %s failed', self.name)
+        finally:
+            self.refreshing.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,18 @@
+import base64
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(height, msg_index):
+    return base64.urlsafe_b64encode(f'{height}:{msg_index}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        height, msg_index = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        return int(height), int(msg_index)
+    except ValueError:
+        raise InvalidCursorError(f'Invalid cursor: {cursor}')
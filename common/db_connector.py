@@ -1,9 +1,18 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
 import clickhouse_connect
+from clickhouse_connect.driver.exceptions import OperationalError
 
 from config import CLICKHOUSE_HOST, CLICKHOUSE_PORT, CLICKHOUSE_USERNAME, CLICKHOUSE_PASSWORD
 
 
 class DBConnector(object):
+    pool_size = min(32, (os.cpu_count() or 1) + 4)
+    idle_check_interval = 30
 
     def __new__(cls):
         if not hasattr(cls, 'instance'):
@@ -11,12 +20,75 @@ class DBConnector(object):
         return cls.instance
 
     def __init__(self):
-        self.clickhouse_client = clickhouse_connect.get_client(
+        if hasattr(self, 'idle_clients'):
+            return
+        self.idle_clients = []
+        self.available = None
+        self.command_client = None
+        self.command_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clickhouse-command')
+
+    def create_client(self):
+        return clickhouse_connect.get_client(
             host=CLICKHOUSE_HOST,
             port=CLICKHOUSE_PORT,
             username=CLICKHOUSE_USERNAME,
             password=CLICKHOUSE_PASSWORD
         )
 
-    def __del__(self):
-        self.clickhouse_client.close()
+    async def acquire(self):
+        while self.idle_clients:
+            client, returned_at = self.idle_clients.pop()
+            if time.monotonic() - returned_at < self.idle_check_interval:
+                return client
+            if await asyncio.to_thread(client.ping):
+                return client
+            client.close()
+        return await asyncio.to_thread(self.create_client)
+
+    def release(self, client):
+        self.idle_clients.append((client, time.monotonic()))
+
+    @asynccontextmanager
+    async def connection(self):
+        if self.available is None:
+            self.available = asyncio.Semaphore(self.pool_size)
+        async with self.available:
+            client = await self.acquire()
+            try:
+                yield client
+            except OperationalError:
+                client.close()
+                raise
+            except Exception:
+                self.release(client)
+                raise
+            except BaseException:
+                client.close()
+                raise
+            else:
+                self.release(client)
+
+    def run_command(self, command):
+        if self.command_client is None:
+            self.command_client = self.create_client()
+        try:
+            return self.command_client.command(command)
+        except OperationalError:
+            self.command_client.close()
+            self.command_client = None
+            raise
+
+    async def command(self, command):
+        """
+        Runs `command` on a client and thread of its own, outside the pool limit, so it gets through
+        while every pooled connection is busy, e.g. to kill the queries holding them.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.command_executor, self.run_command, command)
+
+    def close(self):
+        while self.idle_clients:
+            client, _ = self.idle_clients.pop()
+            client.close()
+        if self.command_client is not None:
+            self.command_client.close()
+            self.command_client = None
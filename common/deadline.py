@@ -0,0 +1,24 @@
+import math
+import time
+from contextvars import ContextVar
+
+
+request_deadline = ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceededError(TimeoutError):
+    pass
+
+
+class QueryBudgetExceededError(RuntimeError):
+    pass
+
+
+def get_remaining_seconds():
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceededError('Request deadline exceeded')
+    return math.ceil(remaining)
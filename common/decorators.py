@@ -1,6 +1,12 @@
+from functools import wraps
+
+from common.cache import StaleWhileRevalidateCache
+from common.single_flight import SingleFlight
+
+
 def get_first_if_exists(func):
-    def wrapper(*args, **kwargs):
-        list_of_items = func(*args, **kwargs)
+    async def wrapper(*args, **kwargs):
+        list_of_items = await func(*args, **kwargs)
         if len(list_of_items):
             return list_of_items[0]
         else:
@@ -8,10 +14,35 @@ def get_first_if_exists(func):
     return wrapper
 
 def response_decorator(func):
-    def wrapper(*args, **kwargs):
-        response = func(*args, **kwargs)
+    async def wrapper(*args, **kwargs):
+        response = await func(*args, **kwargs)
         if 200 <= response.status_code < 300:
             return response.json()
         else:
             return None
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def swr_cache(ttl, maxsize=128, max_stale=None):
+    def decorator(func):
+        cache = StaleWhileRevalidateCache(ttl, maxsize, func.__qualname__, max_stale)
+
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            return await cache.get(key, lambda: func(self, *args, **kwargs))
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+def single_flight(get_version=None):
+    def decorator(func):
+        calls = SingleFlight()
+
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            version = get_version() if get_version else None
+            key = (args, tuple(sorted(kwargs.items())), version)
+            return await calls.do(key, lambda: func(self, *args, **kwargs))
+        wrapper.calls = calls
+        return wrapper
+    return decorator
@@ -0,0 +1,39 @@
+from prometheus_client import Counter, Histogram
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+QUERY_DURATION = Histogram(
+    'warp_db_query_duration_seconds', 'Wall time of ClickHouse queries', ['query'], buckets=LATENCY_BUCKETS)
+QUERY_READ_ROWS = Counter(
+    'warp_db_query_read_rows_total', 'Rows read by ClickHouse queries', ['query'])
+QUERY_READ_BYTES = Counter(
+    'warp_db_query_read_bytes_total', 'Bytes read by ClickHouse queries', ['query'])
+QUERY_RESULT_ROWS = Counter(
+    'warp_db_query_result_rows_total', 'Rows returned by ClickHouse queries', ['query'])
+QUERY_ERRORS = Counter(
+    'warp_db_query_errors_total', 'Failed ClickHouse queries', ['query'])
+
+RPC_DURATION = Histogram(
+    'warp_rpc_duration_seconds', 'Wall time of price feed API calls', ['url', 'status'], buckets=LATENCY_BUCKETS)
+
+REQUEST_DURATION = Histogram(
+    'warp_http_request_duration_seconds', 'Wall time of API requests', ['route', 'method', 'status'], buckets=LATENCY_BUCKETS)
+
+ADMISSION_REJECTIONS = Counter(
+    'warp_admission_rejections_total', 'Requests over a route limit, shed or served a fallback', ['route', 'result'])
+
+CACHE_REQUESTS = Counter(
+    'warp_cache_requests_total', 'Cache lookups by result (hit, stale or miss) and failed background refreshes', ['cache', 'result'])
+
+
+def observe_query(name, elapsed, summary, result_rows):
+    QUERY_DURATION.labels(name).observe(elapsed)
+    QUERY_RESULT_ROWS.labels(name).inc(result_rows)
+    if summary:
+        observe_read(name, summary)
+
+
+def observe_read(name, summary):
+    QUERY_READ_ROWS.labels(name).inc(int(summary.get('read_rows', 0)))
+    QUERY_READ_BYTES.labels(name).inc(int(summary.get('read_bytes', 0)))
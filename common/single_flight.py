@@ -0,0 +1,23 @@
+import asyncio
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self.calls = {}
+
+    async def do(self, key, loader):
+        call = self.calls.get(key)
+        if call is None:
+            future = asyncio.ensure_future(loader())
+            call = self.calls[key] = {'future': future, 'waiters': 0}
+            future.add_done_callback(lambda _: self.calls.pop(key, None))
+        call['waiters'] += 1
+        try:
+            return await asyncio.shield(call['future'])
+        except asyncio.CancelledError:
+            if call['waiters'] == 1:
+                call['future'].cancel()
+            raise
+        finally:
+            call['waiters'] -= 1
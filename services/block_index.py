@@ -0,0 +1,69 @@
+import asyncio
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+
+class BlockHeightIndex(object):
+    retention = timedelta(days=31)
+    min_sync_interval = 1
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(BlockHeightIndex, cls).__new__(cls)
+            cls.instance.heights = array('q')
+            cls.instance.timestamps = array('d')
+            cls.instance.synced_at = 0
+            cls.instance.lock = None
+        return cls.instance
+
+    async def sync(self, db_client):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if time.monotonic() - self.synced_at >= self.min_sync_interval:
+                if self.heights:
+                    blocks = await db_client.get_blocks_after_height(self.heights[-1])
+                else:
+                    since = datetime.now() - self.retention
+                    blocks = await db_client.get_blocks_after_timestamp(datetime.strftime(since, '%Y-%m-%d %H:%M:%S'))
+                for block in blocks:
+                    self.heights.append(block.height)
+                    self.timestamps.append(block.timestamp.timestamp())
+                self.prune()
+                self.synced_at = time.monotonic()
+        return self.get_latest_height()
+
+    def prune(self):
+        position = bisect_left(self.timestamps, (datetime.now() - self.retention).timestamp())
+        if position > len(self.timestamps) // 2:
+            del self.heights[:position]
+            del self.timestamps[:position]
+
+    def get_latest_height(self):
+        return self.heights[-1] if self.heights else None
+
+    def get_latest_timestamp(self):
+        return self.timestamps[-1] if self.timestamps else None
+
+    def covers(self, timestamp):
+        return bool(self.timestamps) and timestamp.timestamp() >= self.timestamps[0]
+
+    def get_height_after_timestamp(self, timestamp):
+        position = bisect_right(self.timestamps, timestamp.timestamp())
+        if position == len(self.heights):
+            return None
+        return self.heights[position]
+
+    def get_height_before_timestamp(self, timestamp):
+        position = bisect_left(self.timestamps, timestamp.timestamp())
+        if position == 0:
+            return None
+        return self.heights[position - 1]
+
+    def get_timestamp(self, height):
+        position = bisect_left(self.heights, height)
+        if position == len(self.heights) or self.heights[position] != height:
+            return None
+        return self.timestamps[position]
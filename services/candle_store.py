@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from services.block_index import BlockHeightIndex
+
+
+logger = logging.getLogger(__name__)
+
+
+class CandlesNotReadyError(RuntimeError):
+    pass
+
+
+class CandleStore(object):
+    """
+    In-memory candles for every interval. Each resolution is backfilled once by a background task,
+    outside any request deadline, and kept once loaded; every resolution tracks the height it is
+    complete up to and is moved forward from the rolling swap window. Every reconcile_interval
+    seconds the last reconcile_window seconds of buckets are re-read from ClickHouse, which picks
+    up swap rows that landed late or were replaced under FINAL.
+    """
+    intervals = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}
+    max_candles = 2000
+    poll_interval = 5
+    reconcile_interval = 300
+    reconcile_window = 3600
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(CandleStore, cls).__new__(cls)
+            cls.instance.reset()
+            cls.instance.lock = None
+            cls.instance.task = None
+        return cls.instance
+
+    def reset(self):
+        self.heights = {}
+        self.since = {}
+        self.candles = {interval: {} for interval in self.intervals}
+        self.reconciled_at = time.monotonic()
+
+    @property
+    def ready(self):
+        return len(self.heights) == len(self.intervals)
+
+    def get_lock(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        return self.lock
+
+    def start(self, db_client):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run(db_client))
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self, db_client):
+        while True:
+            try:
+                if not self.ready:
+                    await self.backfill(db_client)
+                elif time.monotonic() - self.reconciled_at >= self.reconcile_interval:
+                    await self.reconcile(db_client)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Loading candles failed')
+            await asyncio.sleep(self.poll_interval)
+
+    async def backfill(self, db_client):
+        for interval, seconds in self.intervals.items():
+            if interval in self.heights:
+                continue
+            height = await BlockHeightIndex().sync(db_client)
+            if height is None:
+                return
+            since = int(time.time() - seconds * self.max_candles) // seconds * seconds
+            rows = await db_client.get_candles(seconds, since, None, height, None, name='backfill_candles')
+            async with self.get_lock():
+                self.candles[interval] = {}
+                self.install(interval, since, rows, height)
+
+    async def reconcile(self, db_client):
+        height = min(self.heights.values())
+        start = time.time() - self.reconcile_window
+        rows = {
+            interval: await db_client.get_candles(seconds, int(start) // seconds * seconds, None, height, None, name='reconcile_candles')
+            for interval, seconds in self.intervals.items()
+        }
+        async with self.get_lock():
+            for interval, seconds in self.intervals.items():
+                if interval not in self.heights:
+                    continue
+                since = int(start) // seconds * seconds
+                for candles in self.candles[interval].values():
+                    while candles and next(reversed(candles)) >= since:
+                        candles.popitem()
+                self.install(interval, self.since[interval], rows[interval], height)
+        self.reconciled_at = time.monotonic()
+
+    def install(self, interval, since, rows, height):
+        # swaps after `height` are folded in again from the swap window by the next sync
+        for row in rows:
+            self.candles[interval].setdefault(row.pool_id, OrderedDict())[row.bucket] = [
+                row.open, row.high, row.low, row.close, row.base_volume, row.quote_volume,
+            ]
+        self.since[interval] = since
+        self.heights[interval] = height
+
+    async def sync(self, swap_window, pools, height):
+        async with self.get_lock():
+            for interval, interval_height in list(self.heights.items()):
+                if swap_window.window_height is not None and interval_height < swap_window.window_height:
+                    # fell behind the swap window, the background task loads it again
+                    del self.heights[interval]
+                    del self.since[interval]
+                    self.candles[interval] = {}
+            if self.heights and height > min(self.heights.values()):
+                a_denoms = {pool.pool_id: pool.base_currency for pool in pools}
+                self.add(swap_window.get_swaps_after(min(self.heights.values())), a_denoms, height)
+            self.prune()
+
+    def add(self, swaps, a_denoms, height):
+        block_index = BlockHeightIndex()
+        for swap_height, _, pool_id, offer_coin_denom, _, offer_amount, demand_amount, price, success in swaps:
+            if swap_height > height:
+                break
+            timestamp = block_index.get_timestamp(swap_height)
+            if not success or pool_id not in a_denoms or timestamp is None:
+                continue
+            candle = self.make_candle(price, offer_coin_denom == a_denoms[pool_id], offer_amount, demand_amount)
+            for interval, seconds in self.intervals.items():
+                if interval not in self.heights or swap_height <= self.heights[interval]:
+                    continue
+                bucket = int(timestamp) // seconds * seconds
+                candles = self.candles[interval].setdefault(pool_id, OrderedDict())
+                if bucket in candles:
+                    self.merge_candle(candles[bucket], candle)
+                else:
+                    candles[bucket] = list(candle)
+        for interval in self.heights:
+            self.heights[interval] = max(self.heights[interval], height)
+
+    def make_candle(self, price, is_sell, offer_amount, demand_amount):
+        if is_sell:
+            return [price, price, price, price, offer_amount, demand_amount]
+        return [price, price, price, price, demand_amount, offer_amount]
+
+    def merge_candle(self, candle, later):
+        candle[1] = max(candle[1], later[1])
+        candle[2] = min(candle[2], later[2])
+        candle[3] = later[3]
+        candle[4] += later[4]
+        candle[5] += later[5]
+
+    def aggregate(self, swaps, a_denoms):
+        result = {}
+        for _, _, pool_id, offer_coin_denom, _, offer_amount, demand_amount, price, success in swaps:
+            if not success or pool_id not in a_denoms:
+                continue
+            candle = self.make_candle(price, offer_coin_denom == a_denoms[pool_id], offer_amount, demand_amount)
+            if pool_id in result:
+                self.merge_candle(result[pool_id], candle)
+            else:
+                result[pool_id] = candle
+        return result
+
+    def get_window_pieces(self, start_time, end_time):
+        intervals = sorted(self.intervals.items(), key=lambda item: -item[1])
+        earliest = min(self.since.values(), default=end_time)
+        pieces = []
+        position = start_time
+        while position < end_time:
+            for interval, seconds in intervals:
+                if position % seconds == 0 and position + seconds <= end_time and self.covers(interval, position):
+                    pieces.append((interval, position, position + seconds))
+                    position += seconds
+                    break
+            else:
+                next_position = (position // 60 + 1) * 60
+                if position < earliest:
+                    next_position = max(next_position, earliest)
+                next_position = min(next_position, end_time)
+                if pieces and pieces[-1][0] is None and pieces[-1][2] == position:
+                    pieces[-1] = (None, pieces[-1][1], next_position)
+                else:
+                    pieces.append((None, position, next_position))
+                position = next_position
+        return pieces
+
+    def get_bucket(self, interval, bucket):
+        result = {}
+        for pool_id, candles in self.candles[interval].items():
+            if bucket in candles:
+                result[pool_id] = candles[bucket]
+        return result
+
+    def prune(self):
+        now = time.time()
+        for interval in self.since:
+            seconds = self.intervals[interval]
+            since = int(now - seconds * self.max_candles) // seconds * seconds
+            for candles in self.candles[interval].values():
+                while candles and next(iter(candles)) < since:
+                    candles.popitem(last=False)
+            self.since[interval] = max(self.since[interval], since)
+
+    def covers(self, interval, start_time):
+        return interval in self.since and start_time >= self.since[interval]
+
+    def get_candles(self, pool_id, interval, start_time, end_time):
+        return [
+            self.format_candle(bucket, candle)
+            for bucket, candle in self.candles[interval].get(pool_id, {}).items()
+            if start_time <= bucket < end_time
+        ]
+
+    def format_candle(self, bucket, candle):
+        return {
+            'timestamp': bucket,
+            'open': candle[0],
+            'high': candle[1],
+            'low': candle[2],
+            'close': candle[3],
+            'base_volume': candle[4],
+            'quote_volume': candle[5],
+        }
@@ -0,0 +1,58 @@
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class MarketIndex:
+
+    def __init__(self, tickers, denom_traces, volumes=None):
+        self.base_denoms = {self.strip_ibc_prefix(item.denom_hash): item.base_denom for item in denom_traces}
+        self.exponents = {}
+        self.last_prices = {}
+        self.hydrogen_prices = {}
+        for ticker in tickers:
+            self.last_prices.setdefault(ticker.ticker_id, ticker.last_price)
+            if ticker.base_currency == 'hydrogen':
+                self.hydrogen_prices.setdefault(ticker.target_currency, ticker.last_price)
+        self.volumes = volumes or {}
+
+    def strip_ibc_prefix(self, denom):
+        return denom[denom.index('ibc/') + len('ibc/'):] if 'ibc/' in denom else denom
+
+    def get_base_denom(self, denom):
+        if 'ibc/' not in denom:
+            return denom
+        base_denom = self.base_denoms.get(self.strip_ibc_prefix(denom))
+        if base_denom is None:
+            base_denom = next((base for denom_hash, base in self.base_denoms.items() if denom_hash in denom), None)
+        if base_denom is None:
+            logger.warning('No denom trace for %s, its amounts are not scaled', denom)
+            return denom
+        return base_denom
+
+    def get_exponent(self, denom):
+        if denom not in self.exponents:
+            self.exponents[denom] = self.calculate_exponent(self.get_base_denom(denom))
+        return self.exponents[denom]
+
+    def calculate_exponent(self, base_denom):
+        exponent = 0
+        if base_denom.startswith('u'):
+            exponent = -6
+        elif base_denom.startswith('a'):
+            exponent = -18
+        elif base_denom.startswith('milli'):
+            exponent = -3
+        elif base_denom == 'gravity0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2':
+            exponent = -18
+        return exponent
+
+    def get_last_price(self, ticker_id):
+        return self.last_prices.get(ticker_id)
+
+    def get_hydrogen_price(self, denom):
+        return self.hydrogen_prices.get(denom)
+
+    def get_volume(self, pool_id, denom):
+        return self.volumes.get((pool_id, denom), 0)
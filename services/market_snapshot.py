@@ -0,0 +1,32 @@
+import asyncio
+
+
+class MarketSnapshot:
+
+    def __init__(self, height):
+        self.height = height
+        self.views = {}
+        self.locks = {}
+
+    async def get_view(self, name, builder):
+        if name in self.views:
+            return self.views[name]
+        lock = self.locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name not in self.views:
+                self.views[name] = await builder(self)
+        return self.views[name]
+
+
+class MarketSnapshotStore(object):
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(MarketSnapshotStore, cls).__new__(cls)
+            cls.instance.snapshot = None
+        return cls.instance
+
+    def get_snapshot(self, height):
+        if self.snapshot is None or height > self.snapshot.height:
+            self.snapshot = MarketSnapshot(height)
+        return self.snapshot
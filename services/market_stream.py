@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+import time
+
+from services.warp_service import WarpService
+
+
+logger = logging.getLogger(__name__)
+
+
+class MarketStream(object):
+    poll_interval = 1
+    keepalive_interval = 15
+    queue_size = 16
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(MarketStream, cls).__new__(cls)
+            cls.instance.subscribers = set()
+            cls.instance.task = None
+            cls.instance.height = None
+            cls.instance.tickers = {}
+        return cls.instance
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+            self.height = None
+            self.tickers = {}
+
+    def publish(self, event):
+        for queue in self.subscribers:
+            if queue.full():
+                # later events only carry changes, so a subscriber that fell behind is closed
+                # and reconnects to a fresh full state instead of silently missing one
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+            else:
+                queue.put_nowait(event)
+
+    async def run(self):
+        while True:
+            try:
+                event = await self.get_market_update(WarpService())
+                if event is not None:
+                    self.publish(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Publishing market updates failed')
+            await asyncio.sleep(self.poll_interval)
+
+    async def get_market_update(self, service):
+        snapshot = await service.get_snapshot()
+        if snapshot.height == self.height:
+            return None
+        tickers, pools, swap_window = await asyncio.gather(
+            snapshot.get_view('tickers', service.build_tickers),
+            snapshot.get_view('base_for_tickers', service.get_base_for_tickers),
+            snapshot.get_view('swap_window', service.get_swap_window),
+        )
+        tickers = {ticker['ticker_id']: ticker for ticker in tickers if ticker['pool_id'] in service.allowed_pool_ids}
+        changed_tickers = [ticker for ticker_id, ticker in tickers.items() if self.tickers.get(ticker_id) != ticker]
+        trades = []
+        if self.height is not None:
+            pools = {pool.pool_id: pool for pool in pools}
+            for height, msg_index, pool_id, offer_coin_denom, _, offer_amount, demand_amount, price, success in swap_window.get_swaps_after(self.height):
+                if not success or pool_id not in pools or pool_id not in service.allowed_pool_ids:
+                    continue
+                is_sell = offer_coin_denom == pools[pool_id].base_currency
+                trades.append({
+                    'id': msg_index,
+                    'height': height,
+                    'ticker_id': pools[pool_id].ticker_id,
+                    'type': 'sell' if is_sell else 'buy',
+                    'base_volume': offer_amount if is_sell else demand_amount,
+                    'target_volume': demand_amount if is_sell else offer_amount,
+                    'price': price,
+                })
+        self.height = snapshot.height
+        self.tickers = tickers
+        return {'height': snapshot.height, 'tickers': changed_tickers, 'trades': trades}
+
+    def format_event(self, event, ticker_ids):
+        if ticker_ids:
+            event = {
+                'height': event['height'],
+                'tickers': [ticker for ticker in event['tickers'] if ticker['ticker_id'] in ticker_ids],
+                'trades': [trade for trade in event['trades'] if trade['ticker_id'] in ticker_ids],
+            }
+            if not event['tickers'] and not event['trades']:
+                return None
+        return f"id: {event['height']}\nevent: market\ndata: {json.dumps(event, default=str)}\n\n"
+
+    async def events(self, ticker_ids):
+        queue = self.subscribe()
+        try:
+            if self.height is not None:
+                yield self.format_event({'height': self.height, 'tickers': list(self.tickers.values()), 'trades': []}, ticker_ids) or ''
+            # events filtered out by ticker_ids write nothing, so the keepalive follows the last write
+            written_at = time.monotonic()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), max(written_at + self.keepalive_interval - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    written_at = time.monotonic()
+                    continue
+                if event is None:
+                    break
+                message = self.format_event(event, ticker_ids)
+                if message:
+                    yield message
+                    written_at = time.monotonic()
+        finally:
+            self.unsubscribe(queue)
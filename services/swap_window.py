@@ -0,0 +1,195 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+
+SWAP_COLUMNS = ['height', 'msg_index', 'pool_id', 'offer_coin_denom', 'demand_coin_denom',
+                'offer_coin_amount', 'exchanged_demand_coin_amount', 'swap_price', 'success']
+
+
+class RollingSwapWindow(object):
+    # swap rows can land late or be replaced under FINAL, so every sync re-reads the newest heights
+    # and the whole window is reloaded every reload_interval seconds
+    reread_heights = 20
+    reload_interval = 600
+    # height buckets are also grouped into chunks of chunk_heights heights with cached per-pool prices,
+    # so a block only rescans the chunks it added to or expired from
+    chunk_heights = 600
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(RollingSwapWindow, cls).__new__(cls)
+            cls.instance.reset()
+            cls.instance.lock = None
+        return cls.instance
+
+    def reset(self):
+        self.height = None
+        self.window_height = None
+        self.buckets = deque()
+        self.volumes = {}
+        self.chunks = OrderedDict()
+        self.chunk_prices = {}
+        self.loaded_at = 0
+
+    async def sync(self, db_client, window_height, height):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if self.height is None or window_height >= self.height or time.monotonic() - self.loaded_at >= self.reload_interval:
+                swaps = await db_client.get_swaps_between_heights(window_height, height)
+                self.reset()
+                self.add(swaps)
+                self.height = height
+                self.loaded_at = time.monotonic()
+            elif height > self.height:
+                from_height = max(self.height - self.reread_heights, self.window_height)
+                swaps = await db_client.get_swaps_between_heights(from_height, height)
+                self.truncate(from_height)
+                self.add(swaps)
+                self.height = height
+            if self.window_height is None or window_height > self.window_height:
+                self.expire(window_height)
+                self.window_height = window_height
+        return self
+
+    def add(self, swaps):
+        for swap in swaps:
+            if not self.buckets or self.buckets[-1][0] != swap[0]:
+                self.buckets.append((swap[0], []))
+                self.chunks.setdefault(self.get_chunk_start(swap[0]), deque()).append(self.buckets[-1])
+            self.buckets[-1][1].append(swap)
+            if swap[8]:
+                self.update_volume(swap, 1)
+        if swaps:
+            for chunk_start in range(self.get_chunk_start(swaps[0][0]), swaps[-1][0] + 1, self.chunk_heights):
+                self.chunk_prices.pop(chunk_start, None)
+
+    def truncate(self, height):
+        while self.buckets and self.buckets[-1][0] > height:
+            bucket_height, swaps = self.buckets.pop()
+            chunk_start = self.get_chunk_start(bucket_height)
+            self.chunks[chunk_start].pop()
+            if not self.chunks[chunk_start]:
+                del self.chunks[chunk_start]
+            self.chunk_prices.pop(chunk_start, None)
+            for swap in swaps:
+                if swap[8]:
+                    self.update_volume(swap, -1)
+
+    def expire(self, window_height):
+        while self.buckets and self.buckets[0][0] <= window_height:
+            bucket_height, swaps = self.buckets.popleft()
+            chunk_start = self.get_chunk_start(bucket_height)
+            self.chunks[chunk_start].popleft()
+            if not self.chunks[chunk_start]:
+                del self.chunks[chunk_start]
+            self.chunk_prices.pop(chunk_start, None)
+            for swap in swaps:
+                if swap[8]:
+                    self.update_volume(swap, -1)
+
+    def get_chunk_start(self, height):
+        return height // self.chunk_heights * self.chunk_heights
+
+    def merge_prices(self, prices, later):
+        offers = dict(prices[4])
+        for denom, (highest, lowest) in later[4].items():
+            if denom in offers:
+                highest, lowest = max(offers[denom][0], highest), min(offers[denom][1], lowest)
+            offers[denom] = (highest, lowest)
+        return [prices[0], later[1], min(prices[2], later[2]), max(prices[3], later[3]), offers]
+
+    def get_chunk_prices(self, chunk_start):
+        # per pool [first, last, lowest, highest, {offer_coin_denom: (highest, lowest) of successful swaps}]
+        if chunk_start not in self.chunk_prices:
+            prices = {}
+            for _, swaps in self.chunks[chunk_start]:
+                for _, _, pool_id, offer_coin_denom, _, _, _, price, success in swaps:
+                    item = prices.get(pool_id)
+                    if item is None:
+                        item = prices[pool_id] = [price, price, price, price, {}]
+                    item[1] = price
+                    item[2] = min(item[2], price)
+                    item[3] = max(item[3], price)
+                    if success:
+                        highest, lowest = item[4].get(offer_coin_denom, (price, price))
+                        item[4][offer_coin_denom] = (max(highest, price), min(lowest, price))
+            self.chunk_prices[chunk_start] = prices
+        return self.chunk_prices[chunk_start]
+
+    def update_volume(self, swap, sign):
+        key = (swap[2], swap[3], swap[4])
+        offer_volume, demand_volume, count = self.volumes.get(key, (0, 0, 0))
+        count += sign
+        if count:
+            self.volumes[key] = (offer_volume + sign * swap[5], demand_volume + sign * swap[6], count)
+        else:
+            self.volumes.pop(key, None)
+
+    def get_coin_volumes(self):
+        result = {}
+        for (pool_id, offer_coin_denom, demand_coin_denom), (offer_volume, demand_volume, _) in self.volumes.items():
+            result[(pool_id, offer_coin_denom)] = result.get((pool_id, offer_coin_denom), 0) + offer_volume
+            result[(pool_id, demand_coin_denom)] = result.get((pool_id, demand_coin_denom), 0) + demand_volume
+        return result
+
+    def get_volume_pairs(self, pool_ids):
+        pairs = {}
+        for (pool_id, offer_coin_denom, demand_coin_denom), (offer_volume, demand_volume, _) in self.volumes.items():
+            if pool_id not in pool_ids:
+                continue
+            base_volume, target_volume = pairs.get((offer_coin_denom, demand_coin_denom), (0, 0))
+            pairs[(offer_coin_denom, demand_coin_denom)] = (base_volume + offer_volume, target_volume + demand_volume)
+        return pairs
+
+    def get_swaps_after(self, height):
+        result = []
+        for bucket_height, swaps in reversed(self.buckets):
+            if bucket_height <= height:
+                break
+            result.extend(reversed(swaps))
+        result.reverse()
+        return result
+
+    def get_swaps_between(self, from_height, to_height):
+        result = []
+        for bucket_height, swaps in self.buckets:
+            if bucket_height > to_height:
+                break
+            if bucket_height > from_height:
+                result.extend(swaps)
+        return result
+
+    def get_pool_statistics(self, pools):
+        a_denoms = {pool.pool_id: pool.base_currency for pool in pools}
+        volumes = {}
+        for (pool_id, offer_coin_denom, _), (offer_volume, demand_volume, _) in self.volumes.items():
+            if pool_id not in a_denoms:
+                continue
+            base_volume, quote_volume = volumes.get(pool_id, (0, 0))
+            if offer_coin_denom == a_denoms[pool_id]:
+                volumes[pool_id] = (base_volume + offer_volume, quote_volume + demand_volume)
+            else:
+                volumes[pool_id] = (base_volume + demand_volume, quote_volume + offer_volume)
+        pool_prices = {}
+        for chunk_start in self.chunks:
+            for pool_id, prices in self.get_chunk_prices(chunk_start).items():
+                if pool_id in pool_prices:
+                    prices = self.merge_prices(pool_prices[pool_id], prices)
+                pool_prices[pool_id] = prices
+        statistics = {}
+        for pool_id, prices in pool_prices.items():
+            if pool_id not in a_denoms:
+                continue
+            first_price, last_price, lowest_price, highest_price, offers = prices
+            asks = [lowest for denom, (_, lowest) in offers.items() if denom != a_denoms[pool_id]]
+            base_volume, quote_volume = volumes.get(pool_id, (0, 0))
+            statistics[pool_id] = {
+                'first_price': first_price, 'last_price': last_price,
+                'lowest_price_24h': lowest_price, 'highest_price_24h': highest_price,
+                'base_volume': base_volume, 'quote_volume': quote_volume,
+                'highest_bid': offers[a_denoms[pool_id]][0] if a_denoms[pool_id] in offers else 0,
+                'lowest_ask': min(asks) if asks else 0,
+            }
+        return statistics
@@ -0,0 +1,60 @@
+import asyncio
+
+from services.block_index import BlockHeightIndex
+from services.warp_service import WarpService
+
+
+class WarmUp(object):
+    retry_interval = 5
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(WarmUp, cls).__new__(cls)
+            cls.instance.ready = False
+            cls.instance.error = None
+            cls.instance.task = None
+        return cls.instance
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self):
+        while not self.ready:
+            try:
+                await self.preload(WarpService())
+                self.ready = True
+                self.error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.error = repr(e)
+                await asyncio.sleep(self.retry_interval)
+
+    async def preload(self, service):
+        snapshot = await service.get_snapshot()
+        await asyncio.gather(
+            snapshot.get_view('base_for_tickers', service.get_base_for_tickers),
+            snapshot.get_view('denom_traces', service.get_denom_traces),
+            service.get_pairs(False),
+            service.get_wallet_assets(),
+        )
+        await asyncio.gather(
+            service.get_tickers(False),
+            service.get_spot_summary(False),
+            service.get_24_volume_usd(),
+        )
+
+    def get_status(self):
+        status = {
+            'status': 'ready' if self.ready else 'warming_up',
+            'height': BlockHeightIndex().get_latest_height(),
+        }
+        if self.error:
+            status['error'] = self.error
+        return status
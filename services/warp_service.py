@@ -1,8 +1,22 @@
+import asyncio
+import csv
+import io
 import json
 from datetime import datetime, timedelta
 
 from clients.bronbro_api_client import BronbroApiClient
 from clients.db_client import DBClient
+from common.cursor import decode_cursor, encode_cursor
+from common.decorators import single_flight, swr_cache
+from services.block_index import BlockHeightIndex
+from services.candle_store import CandlesNotReadyError, CandleStore
+from services.market_index import MarketIndex
+from services.market_snapshot import MarketSnapshotStore
+from services.swap_window import RollingSwapWindow
+
+
+def get_current_height():
+    return BlockHeightIndex().get_latest_height()
 
 
 class WarpService:
@@ -13,49 +27,33 @@ class WarpService:
         self.bronbro_api_client = BronbroApiClient()
         self.allowed_pool_ids = [1, 12, 7, 5, 6, 10, 26, 18, 11, 2, 15, 24, 13]
 
-    def get_pairs(self, show_all):
+    @swr_cache(ttl=300, maxsize=2)
+    @single_flight(get_current_height)
+    async def get_pairs(self, show_all):
         if show_all:
-            result = self.db_client.get_pairs_liquidity_pool(None)
+            result = await self.db_client.get_pairs_liquidity_pool(None)
         else:
-            result = self.db_client.get_pairs_liquidity_pool(self.allowed_pool_ids)
+            result = await self.db_client.get_pairs_liquidity_pool(self.allowed_pool_ids)
         return [item._asdict() for item in result]
 
-    def set_exponent_for_liquidity(self, liquidity, denom_traces):
-        exponent = 0
-        if 'ibc/' in liquidity['denom']:
-            denom_trace = next((item.base_denom for item in denom_traces if item.denom_hash in liquidity['denom']), None)
-        else:
-            denom_trace = liquidity['denom']
-        if denom_trace.startswith('u'):
-            exponent = -6
-        elif denom_trace.startswith('a'):
-            exponent = -18
-        elif denom_trace.startswith('milli'):
-            exponent = -3
-        elif denom_trace == 'gravity0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2':
-            exponent = -18
-        elif denom_trace == 'aevmos':
-            exponent = -18
-        liquidity['exponent'] = exponent
-
-    def convert_liquidity_amount_to_boot(self, liquidity, tickers, hydrogen_to_boot):
+    def set_exponent_for_liquidity(self, liquidity, market_index):
+        liquidity['exponent'] = market_index.get_exponent(liquidity['denom'])
+
+    def convert_liquidity_amount_to_boot(self, liquidity, market_index, hydrogen_to_boot):
         if liquidity['denom'] == 'boot':
             return
         elif liquidity['denom'] != 'hydrogen':
-            last_price = next((ticker.last_price for ticker in tickers if
-                              ticker.target_currency == liquidity['denom'] and ticker.base_currency == 'hydrogen'),
-                             None)
+            last_price = market_index.get_hydrogen_price(liquidity['denom'])
             liquidity['denom'] = 'hydrogen'
             liquidity['amount'] = liquidity['amount'] * 10**liquidity['exponent'] / last_price
         liquidity['denom'] = 'boot'
         liquidity['amount'] = liquidity['amount'] * hydrogen_to_boot
 
-    def get_boot_price(self, tickers):
-        prices = self.bronbro_api_client.get_exchange_rates()
+    def get_boot_price(self, market_index, prices):
         atom_exchange_rate = next((rate.get('price') for rate in prices if rate.get('symbol') == 'ATOM'), None)
-        hydrogen_to_atom_price = next(ticker.last_price for ticker in tickers if ticker.ticker_id == 'hydrogen_ibc/15E9C5CF5969080539DB395FA7D9C0868265217EFC528433671AAF9B1912D159')
+        hydrogen_to_atom_price = market_index.get_last_price('hydrogen_ibc/15E9C5CF5969080539DB395FA7D9C0868265217EFC528433671AAF9B1912D159')
         hydrogen_price = atom_exchange_rate / hydrogen_to_atom_price / 10**6
-        boot_to_hydrogen_price = next(ticker.last_price for ticker in tickers if ticker.ticker_id == 'boot_hydrogen')
+        boot_to_hydrogen_price = market_index.get_last_price('boot_hydrogen')
         boot_exchange_rate = hydrogen_price / boot_to_hydrogen_price
         return boot_exchange_rate
 
@@ -65,70 +63,85 @@ class WarpService:
     def update_price_based_on_exponent(self, ticker):
         ticker['last_price'] = ticker['last_price'] / 10**ticker['liquidity_a']['exponent'] * 10**ticker['liquidity_b']['exponent']
 
-    def get_tickers(self, show_all):
-        tickers = self.db_client.get_base_for_tickers()
-        boot_price = self.get_boot_price(tickers)
-        hydrogen_to_boot = next((ticker.last_price for ticker in tickers if
-                                 ticker.base_currency == 'boot' and ticker.target_currency == 'hydrogen'), None)
-        ticker_dicts = [ticker._asdict() for ticker in tickers]
-        denom_traces = self.db_client.get_denom_traces()
+    async def get_snapshot(self):
+        height = await BlockHeightIndex().sync(self.db_client)
+        return MarketSnapshotStore().get_snapshot(height or 0)
+
+    async def get_height_after_timestamp(self, timestamp):
+        block_index = BlockHeightIndex()
+        if block_index.covers(timestamp):
+            return block_index.get_height_after_timestamp(timestamp)
+        height = await self.db_client.get_height_after_timestamp(datetime.strftime(timestamp, '%Y-%m-%d %H:%M:%S'))
+        return height.height if height else None
+
+    async def get_height_before_timestamp(self, timestamp):
+        block_index = BlockHeightIndex()
+        if block_index.covers(timestamp):
+            return block_index.get_height_before_timestamp(timestamp) or 0
+        height = await self.get_height_after_timestamp(timestamp - timedelta(seconds=1))
+        return height - 1 if height else None
+
+    async def get_height_24_hours_ago(self, snapshot):
         # TODO: FIX AFTER DB UPDATED
-        datetime_24_hour_ago = datetime.now() - timedelta(hours=24)
-        datetime_24_hour_ago = datetime.strftime(datetime_24_hour_ago, '%Y-%m-%d %H:%M:%S')
-        height = self.db_client.get_height_after_timestamp(datetime_24_hour_ago)
-        height_from_search_volume = height.height if height else None
-        if height_from_search_volume:
-            offer_coins_volume = self.db_client.get_offer_coins_volume(height_from_search_volume)
-            demand_coins_volume = self.db_client.get_demand_coins_volume(height_from_search_volume)
-        else:
-            offer_coins_volume = []
-            demand_coins_volume = []
+        height = await self.get_height_after_timestamp(datetime.now() - timedelta(hours=24))
+        return height if height else snapshot.height
+
+    async def get_base_for_tickers(self, snapshot):
+        return await self.db_client.get_base_for_tickers()
+
+    async def get_denom_traces(self, snapshot):
+        return await self.db_client.get_denom_traces()
+
+    async def get_exchange_rates(self, snapshot):
+        return await self.bronbro_api_client.get_exchange_rates()
+
+    async def get_swap_window(self, snapshot):
+        height = await snapshot.get_view('height_24h', self.get_height_24_hours_ago)
+        return await RollingSwapWindow().sync(self.db_client, height, snapshot.height)
+
+    async def build_tickers(self, snapshot):
+        tickers, prices, denom_traces, swap_window = await asyncio.gather(
+            snapshot.get_view('base_for_tickers', self.get_base_for_tickers),
+            snapshot.get_view('exchange_rates', self.get_exchange_rates),
+            snapshot.get_view('denom_traces', self.get_denom_traces),
+            snapshot.get_view('swap_window', self.get_swap_window),
+        )
+        market_index = MarketIndex(tickers, denom_traces, swap_window.get_coin_volumes())
+        boot_price = self.get_boot_price(market_index, prices)
+        hydrogen_to_boot = market_index.get_last_price('boot_hydrogen')
+        ticker_dicts = [ticker._asdict() for ticker in tickers]
         for ticker in ticker_dicts:
             ticker['liquidity_a'] = json.loads(ticker['liquidity_a'])
             ticker['liquidity_b'] = json.loads(ticker['liquidity_b'])
-            self.set_exponent_for_liquidity(ticker['liquidity_a'], denom_traces)
-            self.set_exponent_for_liquidity(ticker['liquidity_b'], denom_traces)
+            self.set_exponent_for_liquidity(ticker['liquidity_a'], market_index)
+            self.set_exponent_for_liquidity(ticker['liquidity_b'], market_index)
             self.update_price_based_on_exponent(ticker)
-            self.convert_liquidity_amount_to_boot(ticker['liquidity_a'], tickers, hydrogen_to_boot)
-            self.convert_liquidity_amount_to_boot(ticker['liquidity_b'], tickers, hydrogen_to_boot)
+            self.convert_liquidity_amount_to_boot(ticker['liquidity_a'], market_index, hydrogen_to_boot)
+            self.convert_liquidity_amount_to_boot(ticker['liquidity_b'], market_index, hydrogen_to_boot)
             self.set_total_liquidity(boot_price, ticker)
-            base_offer_coin_volume = next((item.sum for item in offer_coins_volume if ticker['pool_id'] == item.pool_id and ticker['base_currency'] == item.offer_coin_denom), 0)
-            target_offer_coin_volume = next((item.sum for item in offer_coins_volume if ticker['pool_id'] == item.pool_id and ticker['target_currency'] == item.offer_coin_denom), 0)
-            base_demand_coin_volume = next((item.sum for item in demand_coins_volume if ticker['pool_id'] == item.pool_id and ticker['base_currency'] == item.demand_coin_denom), 0)
-            target_demand_coin_volume = next((item.sum for item in demand_coins_volume if ticker['pool_id'] == item.pool_id and ticker['target_currency'] == item.demand_coin_denom), 0)
-            ticker['base_volume'] = base_demand_coin_volume + base_offer_coin_volume
-            ticker['target_volume'] = target_demand_coin_volume + target_offer_coin_volume
+            ticker['base_volume'] = market_index.get_volume(ticker['pool_id'], ticker['base_currency'])
+            ticker['target_volume'] = market_index.get_volume(ticker['pool_id'], ticker['target_currency'])
             ticker.pop('liquidity_a')
             ticker.pop('liquidity_b')
+        return ticker_dicts
+
+    async def get_tickers_view(self, snapshot, show_all):
+        ticker_dicts = await snapshot.get_view('tickers', self.build_tickers)
         if not show_all:
             ticker_dicts = list(filter(lambda x: (x['pool_id'] in self.allowed_pool_ids), ticker_dicts))
         return ticker_dicts
 
-    def get_exponent(self, denom, denom_traces):
-        exponent = 0
-        if 'ibc/' in denom:
-            denom_trace = next((item.base_denom for item in denom_traces if item.denom_hash in denom), None)
-        else:
-            denom_trace = denom
-        if denom_trace.startswith('u'):
-            exponent = -6
-        elif denom_trace.startswith('a'):
-            exponent = -18
-        elif denom_trace.startswith('milli'):
-            exponent = -3
-        elif denom_trace == 'gravity0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2':
-            exponent = -18
-        elif denom_trace == 'aevmos':
-            exponent = -18
-        return exponent
-
-    def convert_volume_to_usd(self, denom, exponent, amount, tickers, hydrogen_to_boot, boot_price):
+    @swr_cache(ttl=10, maxsize=2)
+    @single_flight(get_current_height)
+    async def get_tickers(self, show_all):
+        snapshot = await self.get_snapshot()
+        return snapshot.height, await self.get_tickers_view(snapshot, show_all)
+
+    def convert_volume_to_usd(self, denom, exponent, amount, market_index, hydrogen_to_boot, boot_price):
         if denom == 'boot':
             pass
         elif denom != 'hydrogen':
-            last_price = next((ticker.last_price for ticker in tickers if
-                               ticker.target_currency == denom and ticker.base_currency == 'hydrogen'),
-                              None)
+            last_price = market_index.get_hydrogen_price(denom)
             denom = 'hydrogen'
             amount = amount * 10 ** exponent * last_price
 
@@ -136,69 +149,242 @@ class WarpService:
             amount = amount * hydrogen_to_boot
         return amount*boot_price
 
-    def get_24_volume_usd(self):
-        tickers = self.db_client.get_base_for_tickers()
-        boot_price = self.get_boot_price(tickers)
-        hydrogen_to_boot = next((ticker.last_price for ticker in tickers if
-                                 ticker.base_currency == 'boot' and ticker.target_currency == 'hydrogen'), None)
-        denom_traces = self.db_client.get_denom_traces()
-        # TODO: FIX AFTER DB UPDATED
-        datetime_24_hour_ago = datetime.now() - timedelta(hours=24)
-        datetime_24_hour_ago = datetime.strftime(datetime_24_hour_ago, '%Y-%m-%d %H:%M:%S')
-        height = self.db_client.get_height_after_timestamp(datetime_24_hour_ago)
-        height_from_search_volume = height.height
-        pairs = self.db_client.get_last_24_hours_volume_pairs(height_from_search_volume, self.allowed_pool_ids)
-        pair_dicts = [ticker._asdict() for ticker in pairs]
-        result = 0
-        for ticker in pair_dicts:
-            ticker['base_exponent'] = self.get_exponent(ticker['base_currency'], denom_traces)
-            ticker['target_exponent'] = self.get_exponent(ticker['target_currency'], denom_traces)
-            ticker['base_volume_usd'] = self.convert_volume_to_usd(ticker['base_currency'], ticker['base_exponent'], ticker['base_volume'], tickers, hydrogen_to_boot, boot_price)
-            ticker['target_volume_usd'] = self.convert_volume_to_usd(ticker['target_currency'], ticker['target_exponent'], ticker['target_volume'], tickers, hydrogen_to_boot, boot_price)
-            result += ticker['base_volume_usd']
-            result += ticker['target_volume_usd']
-        return {'value': result}
-
-
-    def get_historical_trades(self, ticker_id, limit, offset, type, start_time, end_time):
-        return [item._asdict() for item in self.db_client.get_historical_trades(ticker_id, limit, offset, type, start_time, end_time)]
-
-    def get_spot_recent(self, ticker_id, limit, offset, type, start_time, end_time):
-        return [item._asdict() for item in self.db_client.get_spot_recent(ticker_id, limit, offset, type, start_time, end_time)]
-
-    def get_spot_summary(self, show_all):
-        datetime_24_hour_ago = datetime.now() - timedelta(hours=24)
-        datetime_24_hour_ago = datetime.strftime(datetime_24_hour_ago, '%Y-%m-%d %H:%M:%S')
-        height = self.db_client.get_height_after_timestamp(datetime_24_hour_ago)
-        if show_all:
-            result = self.db_client.get_spot_summary(height.height, None)
-        else:
-            result = self.db_client.get_spot_summary(height.height, self.allowed_pool_ids)
-        result = [item._asdict() for item in result]
+    async def build_24_volume_usd(self, snapshot):
+        usd_rates, swap_window = await asyncio.gather(
+            snapshot.get_view('usd_rates', self.build_usd_rates),
+            snapshot.get_view('swap_window', self.get_swap_window),
+        )
+        value = 0
+        for (base_currency, target_currency), (base_volume, target_volume) in swap_window.get_volume_pairs(self.allowed_pool_ids).items():
+            value += base_volume * usd_rates[base_currency] + target_volume * usd_rates[target_currency]
+        return {'value': float(value)}
+
+    async def get_24_volume_usd_view(self, snapshot):
+        return await snapshot.get_view('volume_usd', self.build_24_volume_usd)
+
+    @swr_cache(ttl=30, maxsize=1)
+    @single_flight(get_current_height)
+    async def get_24_volume_usd(self):
+        snapshot = await self.get_snapshot()
+        return snapshot.height, await self.get_24_volume_usd_view(snapshot)
+
+
+    def paginate_trades(self, result, limit):
+        trades = [item._asdict() for item in result]
+        next_cursor = None
+        if trades and len(trades) == limit:
+            next_cursor = encode_cursor(trades[-1]['height'], trades[-1]['msg_index'])
+        for trade in trades:
+            trade.pop('height')
+            trade.pop('msg_index')
+        return trades, next_cursor
+
+    @single_flight(get_current_height)
+    async def get_historical_trades(self, ticker_id, limit, offset, type, start_time, end_time, cursor=''):
+        position = decode_cursor(cursor) if cursor else None
+        result = await self.db_client.get_historical_trades(ticker_id, limit, 0 if position else offset, type, start_time, end_time, position)
+        return self.paginate_trades(result, limit)
+
+    @single_flight(get_current_height)
+    async def get_spot_recent(self, ticker_id, limit, offset, type, start_time, end_time, cursor=''):
+        position = decode_cursor(cursor) if cursor else None
+        result = await self.db_client.get_spot_recent(ticker_id, limit, 0 if position else offset, type, start_time, end_time, position)
+        return self.paginate_trades(result, limit)
+
+    @single_flight(get_current_height)
+    async def get_historical_trades_batch(self, ticker_ids, limit, type, start_time, end_time):
+        snapshot = await self.get_snapshot()
+        pools = await snapshot.get_view('base_for_tickers', self.get_base_for_tickers)
+        result = {ticker_id: [] for ticker_id in ticker_ids}
+        pool_ids = [pool.pool_id for pool in pools if pool.ticker_id in result]
+        if not pool_ids:
+            return result
+        for item in await self.db_client.get_historical_trades_batch(pool_ids, limit, type, start_time, end_time):
+            trade = item._asdict()
+            trade.pop('height')
+            trade.pop('msg_index')
+            result[trade['ticker_id']].append(trade)
+        return result
+
+    async def export_trades(self, ticker_id, start_time, end_time, format):
+        columns = ['id', 'trade_timestamp', 'height', 'type', 'base_volume', 'target_volume', 'price']
+        if format == 'csv':
+            yield ','.join(columns) + '\n'
+        async for block in self.db_client.stream_trades_export(ticker_id, start_time, end_time):
+            buffer = io.StringIO()
+            if format == 'csv':
+                csv.writer(buffer, lineterminator='\n').writerows(block)
+            else:
+                for row in block:
+                    buffer.write(json.dumps(dict(zip(columns, row)), default=str))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+
+    async def get_swaps_between_timestamps(self, snapshot, swap_window, start_time, end_time):
+        from_height = await self.get_height_before_timestamp(datetime.fromtimestamp(start_time))
+        to_height = await self.get_height_before_timestamp(datetime.fromtimestamp(end_time))
+        from_height = snapshot.height if from_height is None else from_height
+        to_height = snapshot.height if to_height is None else min(to_height, snapshot.height)
+        if to_height <= from_height:
+            return []
+        if swap_window.window_height is not None and from_height >= swap_window.window_height:
+            return swap_window.get_swaps_between(from_height, to_height)
+        return await self.db_client.get_swaps_between_heights(from_height, to_height)
+
+    async def get_window_candles(self, start_time, end_time):
+        snapshot = await self.get_snapshot()
+        pools, swap_window = await asyncio.gather(
+            snapshot.get_view('base_for_tickers', self.get_base_for_tickers),
+            snapshot.get_view('swap_window', self.get_swap_window),
+        )
+        candle_store = CandleStore()
+        await candle_store.sync(swap_window, pools, snapshot.height)
+        pieces = candle_store.get_window_pieces(start_time, end_time)
+        if not candle_store.ready and any(interval is None and end - start > 60 for interval, start, end in pieces):
+            raise CandlesNotReadyError('Candles are still loading')
+        a_denoms = {pool.pool_id: pool.base_currency for pool in pools}
+        result = {}
+        for interval, start, end in pieces:
+            if interval is None:
+                swaps = await self.get_swaps_between_timestamps(snapshot, swap_window, start, end)
+                candles = candle_store.aggregate(swaps, a_denoms)
+            else:
+                candles = candle_store.get_bucket(interval, start)
+            for pool_id, candle in candles.items():
+                if pool_id in result:
+                    candle_store.merge_candle(result[pool_id], candle)
+                else:
+                    result[pool_id] = list(candle)
+        return snapshot, pools, result
+
+    async def build_usd_rates(self, snapshot):
+        tickers, prices, denom_traces = await asyncio.gather(
+            snapshot.get_view('base_for_tickers', self.get_base_for_tickers),
+            snapshot.get_view('exchange_rates', self.get_exchange_rates),
+            snapshot.get_view('denom_traces', self.get_denom_traces),
+        )
+        market_index = MarketIndex(tickers, denom_traces)
+        boot_price = self.get_boot_price(market_index, prices)
+        hydrogen_to_boot = market_index.get_last_price('boot_hydrogen')
+        denoms = {ticker.base_currency for ticker in tickers} | {ticker.target_currency for ticker in tickers}
+        return {
+            denom: self.convert_volume_to_usd(denom, market_index.get_exponent(denom), 1, market_index, hydrogen_to_boot, boot_price)
+            for denom in denoms
+        }
+
+    @swr_cache(ttl=10, maxsize=64)
+    @single_flight(get_current_height)
+    async def get_volume_in_usd(self, start_time, end_time):
+        snapshot, pools, candles = await self.get_window_candles(start_time, end_time)
+        usd_rates = await snapshot.get_view('usd_rates', self.build_usd_rates)
+        value = 0
+        for pool in pools:
+            if pool.pool_id in self.allowed_pool_ids and pool.pool_id in candles:
+                candle = candles[pool.pool_id]
+                value += candle[4] * usd_rates[pool.base_currency] + candle[5] * usd_rates[pool.target_currency]
+        return snapshot.height, {'value': float(value), 'from': start_time, 'to': end_time}
+
+    @swr_cache(ttl=10, maxsize=64)
+    @single_flight(get_current_height)
+    async def get_spot_stats(self, start_time, end_time):
+        snapshot, pools, candles = await self.get_window_candles(start_time, end_time)
+        result = []
+        for pool in pools:
+            if pool.pool_id not in self.allowed_pool_ids:
+                continue
+            open_price, high, low, close, base_volume, quote_volume = candles.get(pool.pool_id, [0, 0, 0, 0, 0, 0])
+            result.append({
+                'trading_pairs': pool.ticker_id,
+                'first_price': open_price,
+                'last_price': close,
+                'highest_price': high,
+                'lowest_price': low,
+                'base_volume': base_volume,
+                'quote_volume': quote_volume,
+                'price_change_percent': abs((close / open_price - 1) * 100) if open_price and close else 0,
+            })
+        return snapshot.height, result
+
+    @single_flight(get_current_height)
+    async def get_candles(self, ticker_id, interval, start_time, end_time):
+        snapshot = await self.get_snapshot()
+        pools, swap_window = await asyncio.gather(
+            snapshot.get_view('base_for_tickers', self.get_base_for_tickers),
+            snapshot.get_view('swap_window', self.get_swap_window),
+        )
+        pool = next((pool for pool in pools if pool.ticker_id == ticker_id), None)
+        if pool is None:
+            return snapshot.height, []
+        candle_store = CandleStore()
+        await candle_store.sync(swap_window, pools, snapshot.height)
+        seconds = candle_store.intervals[interval]
+        start_time = start_time // seconds * seconds
+        if candle_store.covers(interval, start_time):
+            return snapshot.height, candle_store.get_candles(pool.pool_id, interval, start_time, end_time)
+        rows = await self.db_client.get_candles(seconds, start_time, end_time, snapshot.height, pool.pool_id)
+        return snapshot.height, [
+            candle_store.format_candle(row.bucket, [row.open, row.high, row.low, row.close, row.base_volume, row.quote_volume])
+            for row in rows
+        ]
+
+    async def build_spot_summary(self, snapshot):
+        tickers, swap_window = await asyncio.gather(
+            snapshot.get_view('base_for_tickers', self.get_base_for_tickers),
+            snapshot.get_view('swap_window', self.get_swap_window),
+        )
+        statistics = swap_window.get_pool_statistics(tickers)
+        result = []
+        for ticker in tickers:
+            item = {
+                'pool_id': ticker.pool_id, 'trading_pairs': ticker.ticker_id,
+                'last_price': 0, 'lowest_price_24h': 0, 'highest_price_24h': 0, 'first_price': 0,
+                'base_volume': 0, 'quote_volume': 0, 'highest_bid': 0, 'lowest_ask': 0,
+            }
+            item.update(statistics.get(ticker.pool_id, {}))
+            result.append(item)
         for item in result:
             item['price_change_percent_24h'] = abs((item['last_price']/item['first_price'] - 1) * 100) if item['first_price'] and item['last_price'] else 0
+        return result
+
+    async def get_spot_summary_view(self, snapshot, show_all):
+        result = []
+        for item in await snapshot.get_view('spot_summary', self.build_spot_summary):
+            if not show_all and item['pool_id'] not in self.allowed_pool_ids:
+                continue
+            item = dict(item)
             item.pop('pool_id')
             item.pop('first_price')
+            result.append(item)
         return result
 
-    def get_spot_ticker(self, show_all):
-        datetime_24_hour_ago = datetime.now() - timedelta(hours=24)
-        datetime_24_hour_ago = datetime.strftime(datetime_24_hour_ago, '%Y-%m-%d %H:%M:%S')
-        height = self.db_client.get_height_after_timestamp(datetime_24_hour_ago)
-        if show_all:
-            result_list = self.db_client.get_spot_ticker(height.height, None)
-        else:
-            result_list = self.db_client.get_spot_ticker(height.height, self.allowed_pool_ids)
+    @swr_cache(ttl=10, maxsize=2)
+    @single_flight(get_current_height)
+    async def get_spot_summary(self, show_all):
+        snapshot = await self.get_snapshot()
+        return snapshot.height, await self.get_spot_summary_view(snapshot, show_all)
+
+    async def get_spot_ticker_view(self, snapshot, show_all):
         result = {}
-        for item in result_list:
-            item_dict = item._asdict()
-            item_dict.pop('pool_id')
-            item_dict.pop('trading_pairs')
-            result[item.trading_pairs] = item_dict
+        for item in await snapshot.get_view('spot_summary', self.build_spot_summary):
+            if not show_all and item['pool_id'] not in self.allowed_pool_ids:
+                continue
+            result[item['trading_pairs']] = {
+                'last_price': item['last_price'],
+                'base_volume': item['base_volume'],
+                'quote_volume': item['quote_volume'],
+            }
         return result
 
-    def get_wallet_assets(self):
-        db_response = self.db_client.get_denom_traces()
+    @swr_cache(ttl=10, maxsize=2)
+    @single_flight(get_current_height)
+    async def get_spot_ticker(self, show_all):
+        snapshot = await self.get_snapshot()
+        return snapshot.height, await self.get_spot_ticker_view(snapshot, show_all)
+
+    @swr_cache(ttl=300, maxsize=1)
+    @single_flight(get_current_height)
+    async def get_wallet_assets(self):
+        db_response = await self.db_client.get_denom_traces()
         result = {}
         for item in db_response:
             result[item.base_denom] = {
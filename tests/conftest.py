@@ -0,0 +1,47 @@
+import importlib.util
+import sys
+import types
+
+if importlib.util.find_spec('config') is None:
+    # config.py is provided at deploy time; nothing under test connects to ClickHouse or the price feed
+    config = types.ModuleType('config')
+    config.CLICKHOUSE_HOST = 'localhost'
+    config.CLICKHOUSE_PORT = 8123
+    config.CLICKHOUSE_USERNAME = 'default'
+    config.CLICKHOUSE_PASSWORD = ''
+    config.PRICE_FEED_API = 'http://localhost/'
+    sys.modules['config'] = config
+
+import pytest
+
+from benchmarks.synthetic_market import SyntheticApiClient, SyntheticDBClient, SyntheticMarket
+from services.block_index import BlockHeightIndex
+from services.candle_store import CandleStore
+from services.market_snapshot import MarketSnapshotStore
+from services.swap_window import RollingSwapWindow
+from services.warp_service import WarpService
+
+
+@pytest.fixture(autouse=True)
+def reset_singletons():
+    for cls in (BlockHeightIndex, CandleStore, MarketSnapshotStore, RollingSwapWindow):
+        if 'instance' in vars(cls):
+            del cls.instance
+    for name in dir(WarpService):
+        cache = getattr(getattr(WarpService, name), 'cache', None)
+        if cache is not None:
+            cache.clear()
+    yield
+
+
+@pytest.fixture
+def market():
+    return SyntheticMarket(pools=10, denoms=8, swaps_per_day=3000, days=9, pending_blocks=200)
+
+
+@pytest.fixture
+def service(market):
+    service = WarpService()
+    service.db_client = SyntheticDBClient(market)
+    service.bronbro_api_client = SyntheticApiClient()
+    return service
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+
+from app.admission import AdmissionControl, AdmissionLimit
+
+
+def make_app(limit):
+    app = FastAPI()
+    app.middleware("http")(AdmissionControl({'/x': limit}))
+    app.state.gate = asyncio.Event()
+
+    @app.get('/x')
+    async def x():
+        await app.state.gate.wait()
+        return {'ok': 1}
+
+    return app
+
+
+def get_rejections(result):
+    return REGISTRY.get_sample_value('warp_admission_rejections_total', {'route': '/x', 'result': result}) or 0
+
+
+def test_fallback_is_served_without_queueing():
+    async def run():
+        limit = AdmissionLimit(1, 8, queue_timeout=1, fallback=True)
+        app = make_app(limit)
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            app.state.gate.set()
+            assert (await client.get('/x')).status_code == 200
+            app.state.gate.clear()
+            slow = asyncio.ensure_future(client.get('/x'))
+            await asyncio.sleep(0.05)
+            fallbacks = get_rejections('fallback')
+            started = time.monotonic()
+            response = await client.get('/x')
+            assert time.monotonic() - started < limit.queue_timeout / 2
+            assert response.status_code == 200
+            assert response.json() == {'ok': 1}
+            assert response.headers['warning'] == '110 - "Response is Stale"'
+            assert get_rejections('fallback') == fallbacks + 1
+            app.state.gate.set()
+            assert (await slow).status_code == 200
+    asyncio.run(run())
+
+
+def test_queued_request_is_shed_after_timeout():
+    async def run():
+        limit = AdmissionLimit(1, 8, queue_timeout=0.2, retry_after=7, fallback=True)
+        app = make_app(limit)
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            slow = asyncio.ensure_future(client.get('/x'))
+            await asyncio.sleep(0.05)
+            shed = get_rejections('shed')
+            started = time.monotonic()
+            response = await client.get('/x?other=1')
+            assert time.monotonic() - started >= limit.queue_timeout
+            assert response.status_code == 503
+            assert response.headers['retry-after'] == '7'
+            assert get_rejections('shed') == shed + 1
+            app.state.gate.set()
+            assert (await slow).status_code == 200
+    asyncio.run(run())
+
+
+def test_queued_request_runs_when_a_slot_frees():
+    async def run():
+        app = make_app(AdmissionLimit(1, 8, queue_timeout=1))
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            slow = asyncio.ensure_future(client.get('/x'))
+            await asyncio.sleep(0.05)
+            queued = asyncio.ensure_future(client.get('/x?other=1'))
+            await asyncio.sleep(0.05)
+            app.state.gate.set()
+            assert (await slow).status_code == 200
+            assert (await queued).status_code == 200
+    asyncio.run(run())
+
+
+def test_full_queue_sheds_immediately():
+    async def run():
+        limit = AdmissionLimit(1, 0, queue_timeout=1)
+        app = make_app(limit)
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            slow = asyncio.ensure_future(client.get('/x'))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            response = await client.get('/x')
+            assert time.monotonic() - started < limit.queue_timeout / 2
+            assert response.status_code == 503
+            assert response.headers['retry-after'] == '1'
+            app.state.gate.set()
+            assert (await slow).status_code == 200
+    asyncio.run(run())
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from common.cache import StaleWhileRevalidateCache
+
+
+class Loader:
+
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    async def __call__(self):
+        value = self.values[min(self.calls, len(self.values) - 1)]
+        self.calls += 1
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def get_cache_requests(name, result):
+    return REGISTRY.get_sample_value('warp_cache_requests_total', {'cache': name, 'result': result}) or 0
+
+
+def test_fresh_value_is_a_hit():
+    async def run():
+        cache = StaleWhileRevalidateCache(ttl=60, maxsize=4, name='test_hit')
+        loader = Loader(1, 2)
+        assert await cache.get('key', loader) == 1
+        assert await cache.get('key', loader) == 1
+        assert loader.calls == 1
+    asyncio.run(run())
+    assert get_cache_requests('test_hit', 'hit') == 1
+
+
+def test_stale_value_is_served_while_refreshing():
+    async def run():
+        cache = StaleWhileRevalidateCache(ttl=0, maxsize=4, name='test_stale', max_stale=60)
+        loader = Loader(1, 2)
+        assert await cache.get('key', loader) == 1
+        assert await cache.get('key', loader) == 1
+        assert await cache.get('key', loader) == 1
+        await asyncio.sleep(0)
+        assert loader.calls == 2
+        assert cache.entries['key'][0] == 2
+    asyncio.run(run())
+
+
+def test_value_past_max_stale_is_loaded_again():
+    async def run():
+        cache = StaleWhileRevalidateCache(ttl=0, maxsize=4, name='test_max_stale', max_stale=0)
+        assert await cache.get('key', Loader(1)) == 1
+        with pytest.raises(RuntimeError):
+            await cache.get('key', Loader(RuntimeError('down')))
+        assert 'key' not in cache.entries
+    asyncio.run(run())
+
+
+def test_failed_refresh_keeps_value_and_is_counted():
+    async def run():
+        cache = StaleWhileRevalidateCache(ttl=0, maxsize=4, name='test_refresh_error', max_stale=60)
+        loader = Loader(1, RuntimeError('down'))
+        assert await cache.get('key', loader) == 1
+        assert await cache.get('key', loader) == 1
+        await asyncio.sleep(0)
+        assert cache.entries['key'][0] == 1
+        assert not cache.refreshing
+    asyncio.run(run())
+    assert get_cache_requests('test_refresh_error', 'refresh_error') == 1
+
+
+def test_oldest_entry_is_evicted():
+    async def run():
+        cache = StaleWhileRevalidateCache(ttl=60, maxsize=2, name='test_evict')
+        for key in ['a', 'b', 'a', 'c']:
+            await cache.get(key, Loader(key))
+        assert list(cache.entries) == ['a', 'c']
+    asyncio.run(run())
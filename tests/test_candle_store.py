@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from services.block_index import BlockHeightIndex
+from services.candle_store import CandlesNotReadyError, CandleStore
+
+
+def get_expected_candles(market, start_time, end_time):
+    swaps = market.swaps
+    timestamps = market.block_timestamps[swaps['height'] - 1]
+    result = {}
+    for pool_id, a_denom, _ in market.pools:
+        mask = (swaps['pool_id'] == pool_id) & swaps['success'] & (swaps['height'] <= market.tip)
+        mask &= (timestamps >= start_time) & (timestamps < end_time)
+        if not mask.any():
+            continue
+        is_sell = swaps['offer_coin_denom'][mask] == a_denom
+        prices = swaps['swap_price'][mask]
+        offer_amounts = swaps['offer_coin_amount'][mask]
+        demand_amounts = swaps['exchanged_demand_coin_amount'][mask]
+        result[pool_id] = [
+            prices[0], prices.max(), prices.min(), prices[-1],
+            np.where(is_sell, offer_amounts, demand_amounts).sum(),
+            np.where(is_sell, demand_amounts, offer_amounts).sum(),
+        ]
+    return result
+
+
+def assert_candles(candles, expected):
+    assert candles.keys() == expected.keys()
+    for pool_id, candle in expected.items():
+        assert np.allclose(candles[pool_id], candle), pool_id
+
+
+def advance(market, blocks=1):
+    market.advance(blocks)
+    BlockHeightIndex().synced_at = 0
+
+
+def test_window_pieces():
+    day = int(time.time()) // 86400 * 86400
+    store = CandleStore()
+    store.since = {interval: day - 10 * 86400 for interval in store.intervals}
+    start_time, end_time = day - 86400 - 3600 - 61, day + 3600 + 150
+    assert store.get_window_pieces(start_time, end_time) == [
+        (None, start_time, day - 90060),
+        ('1m', day - 90060, day - 90000),
+        ('1h', day - 90000, day - 86400),
+        ('1d', day - 86400, day),
+        ('1h', day, day + 3600),
+        ('1m', day + 3600, day + 3660),
+        ('1m', day + 3660, day + 3720),
+        (None, day + 3720, end_time),
+    ]
+
+
+def test_window_pieces_before_rollups():
+    day = int(time.time()) // 86400 * 86400
+    store = CandleStore()
+    store.since = {'1d': day - 86400, '1h': day - 3600, '5m': day, '1m': day}
+    assert store.get_window_pieces(day - 86400 - 100, day + 360) == [
+        (None, day - 86400 - 100, day - 86400),
+        ('1d', day - 86400, day),
+        ('5m', day, day + 300),
+        ('1m', day + 300, day + 360),
+    ]
+    store.since = {}
+    assert store.get_window_pieces(day - 100, day + 30) == [(None, day - 100, day + 30)]
+
+
+def test_window_candles_need_backfill(market, service):
+    now = int(time.time())
+
+    async def run():
+        with pytest.raises(CandlesNotReadyError):
+            await service.get_window_candles(now - 86400, now)
+        _, _, candles = await service.get_window_candles(now - 30, now)
+        assert_candles(candles, get_expected_candles(market, now - 30, now))
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize('start_offset, end_offset', [
+    (86400, 0),
+    (7 * 86400 + 1234, 777),
+    (3 * 86400 - 59, 86400 + 1),
+    (2 * 86400 + 77, -200),
+    (600, 0),
+])
+def test_window_candles_match_swaps(market, service, start_offset, end_offset):
+    now = int(time.time())
+    start_time, end_time = now - start_offset, now - end_offset
+
+    async def run():
+        await CandleStore().backfill(service.db_client)
+        assert CandleStore().ready
+        _, _, candles = await service.get_window_candles(start_time, end_time)
+        assert_candles(candles, get_expected_candles(market, start_time, end_time))
+        advance(market, 30)
+        _, _, candles = await service.get_window_candles(start_time, end_time)
+        assert_candles(candles, get_expected_candles(market, start_time, end_time))
+    asyncio.run(run())
+
+
+def test_reconcile_picks_up_late_rows(market, service):
+    now = int(time.time())
+    start_time, end_time = now - 86400, (now + 180) // 60 * 60
+    store = CandleStore()
+
+    async def run():
+        await store.backfill(service.db_client)
+        advance(market, 30)
+        await service.get_window_candles(start_time, end_time)
+        position = np.searchsorted(market.swaps['height'], market.tip - 18)
+        while not market.swaps['success'][position]:
+            position += 1
+        market.swaps['offer_coin_amount'][position] += 10 ** 9
+        advance(market)
+        _, _, candles = await service.get_window_candles(start_time, end_time)
+        assert candles != get_expected_candles(market, start_time, end_time)
+        await store.reconcile(service.db_client)
+        _, _, candles = await service.get_window_candles(start_time, end_time)
+        assert_candles(candles, get_expected_candles(market, start_time, end_time))
+    asyncio.run(run())
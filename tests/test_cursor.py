@@ -0,0 +1,16 @@
+import pytest
+
+from common.cursor import InvalidCursorError, decode_cursor, encode_cursor
+
+
+def test_round_trip():
+    for height, msg_index in [(1, 0), (12345678, 17), (2 ** 40, 999)]:
+        cursor = encode_cursor(height, msg_index)
+        assert '=' not in cursor
+        assert decode_cursor(cursor) == (height, msg_index)
+
+
+@pytest.mark.parametrize('cursor', ['x', '!!!!', encode_cursor('a', 1), 'MTIz', '_w'])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
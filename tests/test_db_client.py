@@ -0,0 +1,89 @@
+import asyncio
+import re
+import threading
+
+import pytest
+from clickhouse_connect.driver.exceptions import DatabaseError
+
+from clients.db_client import DBClient
+from common.db_connector import DBConnector
+
+
+class FakeStream:
+    def __init__(self, client):
+        self.client = client
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.client.events.append('stream closed')
+
+    def __iter__(self):
+        yield [(1,), (2,)]
+        # blocks like a slow ClickHouse read until the query is killed
+        self.client.killed.wait(5)
+        self.client.events.append('read returned')
+        raise DatabaseError('Code: 394. DB::Exception: Query was cancelled')
+
+
+class FakeClient:
+    def __init__(self):
+        self.events = []
+        self.kills = []
+        self.killed = threading.Event()
+
+    def query_row_block_stream(self, query, parameters=None, settings=None):
+        return FakeStream(self)
+
+    def command(self, command):
+        self.kills.append(re.search(r"query_id = '([^']+)'", command).group(1))
+        self.killed.set()
+
+    def ping(self):
+        return True
+
+    def close(self):
+        self.events.append('client closed')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(DBConnector, 'create_client', lambda self: client)
+    if 'instance' in vars(DBConnector):
+        del DBConnector.instance
+    yield client
+    del DBConnector.instance
+
+
+def test_cancelled_stream_kills_query_and_waits_for_read(client):
+    async def run():
+        db_client = DBClient()
+        blocks = db_client.stream_query('SELECT 1', name='stream_trades_export')
+
+        async def consume():
+            return [block async for block in blocks]
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.2)
+        assert not task.done()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert len(client.kills) == 1
+        assert client.kills[0].startswith('warp-stream_trades_export-')
+        assert client.events == ['read returned', 'stream closed', 'client closed']
+    asyncio.run(run())
+
+
+def test_closed_stream_kills_query(client):
+    async def run():
+        db_client = DBClient()
+        blocks = db_client.stream_query('SELECT 1', name='stream_trades_export')
+        assert await blocks.__anext__() == [(1,), (2,)]
+        await blocks.aclose()
+        await asyncio.sleep(0.1)
+        assert len(client.kills) == 1
+        assert client.events[0] == 'stream closed'
+    asyncio.run(run())
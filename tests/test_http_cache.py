@@ -0,0 +1,65 @@
+import asyncio
+from email.utils import formatdate
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.http_cache import conditional_cache_middleware, get_validators
+from services.block_index import BlockHeightIndex
+
+
+def make_app(served):
+    app = FastAPI()
+    app.middleware("http")(conditional_cache_middleware)
+
+    @app.get('/tickers/')
+    async def get_tickers():
+        return JSONResponse({'height': served['height']}, headers=get_validators(served['height']))
+    return app
+
+
+def get(app, headers=None):
+    async def run():
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            return await client.get('/tickers/', headers=headers or {})
+    return asyncio.run(run())
+
+
+def index_blocks(*blocks):
+    block_index = BlockHeightIndex()
+    for height, timestamp in blocks:
+        block_index.heights.append(height)
+        block_index.timestamps.append(timestamp)
+
+
+def test_etag_comes_from_the_served_height():
+    index_blocks((1000, 1700000000), (1001, 1700000006))
+    app = make_app({'height': 1000})
+    response = get(app)
+    assert response.status_code == 200
+    assert response.headers['etag'] == 'W/"1000"'
+    assert response.headers['last-modified'] == formatdate(1700000000, usegmt=True)
+    assert response.headers['cache-control'] == 'public, max-age=5'
+
+
+def test_not_modified():
+    index_blocks((1000, 1700000000), (1001, 1700000006))
+    served = {'height': 1000}
+    app = make_app(served)
+    for headers in [{'if-none-match': 'W/"1000"'}, {'if-none-match': '"1000", "999"'},
+                    {'if-modified-since': formatdate(1700000000, usegmt=True)}]:
+        response = get(app, headers)
+        assert response.status_code == 304
+        assert response.headers['etag'] == 'W/"1000"'
+        assert not response.content
+    served['height'] = 1001
+    assert get(app, {'if-none-match': 'W/"1000"'}).status_code == 200
+    assert get(app, {'if-modified-since': formatdate(1700000000, usegmt=True)}).status_code == 200
+
+
+def test_no_etag_without_a_height():
+    app = make_app({'height': None})
+    response = get(app, {'if-none-match': '*'})
+    assert response.status_code == 200
+    assert 'etag' not in response.headers
@@ -0,0 +1,20 @@
+from benchmarks.synthetic_market import ATOM_DENOM_HASH, DenomTrace
+from services.market_index import MarketIndex
+
+
+def test_base_denom_for_unprefixed_trace():
+    market_index = MarketIndex([], [DenomTrace(ATOM_DENOM_HASH, 'uatom')])
+    assert market_index.get_base_denom(f'ibc/{ATOM_DENOM_HASH}') == 'uatom'
+    assert market_index.get_exponent(f'ibc/{ATOM_DENOM_HASH}') == -6
+
+
+def test_base_denom_for_prefixed_trace():
+    market_index = MarketIndex([], [DenomTrace(f'ibc/{ATOM_DENOM_HASH}', 'uatom')])
+    assert market_index.get_base_denom(f'ibc/{ATOM_DENOM_HASH}') == 'uatom'
+
+
+def test_base_denom_without_trace(caplog):
+    market_index = MarketIndex([], [DenomTrace(ATOM_DENOM_HASH, 'uatom')])
+    assert market_index.get_base_denom('ibc/0000') == 'ibc/0000'
+    assert 'ibc/0000' in caplog.text
+    assert market_index.get_base_denom('uboot') == 'uboot'
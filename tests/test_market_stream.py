@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from services.market_stream import MarketStream
+
+
+def make_event(height, ticker_id):
+    return {'height': height, 'tickers': [{'ticker_id': ticker_id}], 'trades': []}
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    async def get_market_update(self, service):
+        return None
+
+    monkeypatch.setattr(MarketStream, 'get_market_update', get_market_update)
+    if 'instance' in vars(MarketStream):
+        del MarketStream.instance
+    return MarketStream()
+
+
+def test_lagging_subscriber_is_closed(stream):
+    async def run():
+        stream.height = 10
+        stream.tickers = {'a_b': {'ticker_id': 'a_b'}}
+        events = stream.events(None)
+        assert (await events.__anext__()).startswith('id: 10\n')
+        waiting = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+        for height in range(11, 12 + stream.queue_size):
+            stream.publish(make_event(height, 'a_b'))
+        with pytest.raises(StopAsyncIteration):
+            await waiting
+        assert not stream.subscribers
+        assert stream.task is None
+        assert stream.height is None and stream.tickers == {}
+    asyncio.run(run())
+
+
+def test_keepalive_while_events_are_filtered_out(stream, monkeypatch):
+    monkeypatch.setattr(MarketStream, 'keepalive_interval', 0.05)
+
+    async def run():
+        events = stream.events(['a_b'])
+        message = asyncio.ensure_future(events.__anext__())
+        for height in range(20):
+            stream.publish(make_event(height, 'c_d'))
+            await asyncio.sleep(0.01)
+            if message.done():
+                break
+        assert message.result() == ': keepalive\n\n'
+        stream.publish(make_event(20, 'a_b'))
+        assert (await events.__anext__()).startswith('id: 20\n')
+        await events.aclose()
+    asyncio.run(run())
+
+
+def test_failed_update_is_logged(stream, monkeypatch, caplog):
+    async def get_market_update(self, service):
+        raise RuntimeError('snapshot failed')
+
+    monkeypatch.setattr(MarketStream, 'get_market_update', get_market_update)
+
+    async def run():
+        queue = stream.subscribe()
+        await asyncio.sleep(0.01)
+        stream.unsubscribe(queue)
+    asyncio.run(run())
+    assert 'Publishing market updates failed' in caplog.text
+    assert 'snapshot failed' in caplog.text
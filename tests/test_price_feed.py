@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+
+from clients.bronbro_api_client import BronbroApiClient, PriceFeedUnavailableError
+from common.circuit_breaker import CircuitBreaker
+
+
+RATES = [{'symbol': 'ATOM', 'price': 10.0}]
+
+
+class PriceFeed:
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def __call__(self, request):
+        status = self.statuses[min(self.calls, len(self.statuses) - 1)]
+        self.calls += 1
+        return httpx.Response(status, json=RATES if status == 200 else {})
+
+
+@pytest.fixture
+def price_feed(monkeypatch):
+    def install(*statuses):
+        feed = PriceFeed(*statuses)
+        monkeypatch.setattr(BronbroApiClient, 'http_client', httpx.AsyncClient(transport=httpx.MockTransport(feed)))
+        return feed
+    monkeypatch.setattr(BronbroApiClient, 'exchange_rates_breaker', CircuitBreaker(failure_threshold=3, reset_timeout=30))
+    monkeypatch.setattr(BronbroApiClient, 'last_exchange_rates', None)
+    BronbroApiClient.get_exchange_rates.cache.clear()
+    yield install
+    BronbroApiClient.get_exchange_rates.cache.clear()
+
+
+def test_cold_failure_is_not_cached(price_feed):
+    feed = price_feed(502, 200)
+
+    async def run():
+        client = BronbroApiClient()
+        with pytest.raises(PriceFeedUnavailableError):
+            await client.get_exchange_rates()
+        assert await client.get_exchange_rates() == RATES
+    asyncio.run(run())
+    assert feed.calls == 2
+    assert BronbroApiClient.exchange_rates_breaker.failures == 0
+
+
+def test_failure_serves_last_good_rates(price_feed):
+    feed = price_feed(200, 502)
+
+    async def run():
+        client = BronbroApiClient()
+        assert await client.get_exchange_rates() == RATES
+        BronbroApiClient.get_exchange_rates.cache.clear()
+        assert await client.get_exchange_rates() == RATES
+    asyncio.run(run())
+    assert feed.calls == 2
+    assert BronbroApiClient.exchange_rates_breaker.failures == 1
+
+
+def test_open_breaker_skips_the_feed(price_feed):
+    feed = price_feed(502)
+
+    async def run():
+        client = BronbroApiClient()
+        for _ in range(3):
+            with pytest.raises(PriceFeedUnavailableError):
+                await client.get_exchange_rates()
+        assert BronbroApiClient.exchange_rates_breaker.is_open()
+        with pytest.raises(PriceFeedUnavailableError):
+            await client.get_exchange_rates()
+    asyncio.run(run())
+    assert feed.calls == 3
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.main import run_with_deadline
+from common.deadline import get_remaining_seconds
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after=None):
+        self.disconnect_after = disconnect_after
+
+    async def receive(self):
+        if self.disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.disconnect_after)
+        return {'type': 'http.disconnect'}
+
+
+def run_loader(request, timeout):
+    calls = []
+
+    async def loader():
+        calls.append(get_remaining_seconds())
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            calls.append('cancelled')
+            raise
+
+    async def run():
+        try:
+            return await run_with_deadline(request, loader, timeout=timeout)
+        finally:
+            await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run())
+    return error.value, calls
+
+
+def test_deadline_maps_to_504_and_cancels_loader():
+    error, calls = run_loader(FakeRequest(), timeout=0.1)
+    assert error.status_code == 504
+    assert error.detail == 'Request deadline exceeded'
+    assert calls[0] is not None
+    assert calls[1:] == ['cancelled']
+
+
+def test_disconnect_maps_to_499_and_cancels_loader():
+    error, calls = run_loader(FakeRequest(disconnect_after=0.05), timeout=1)
+    assert error.status_code == 499
+    assert calls[1:] == ['cancelled']
+
+
+def test_result_is_returned_within_deadline():
+    async def loader():
+        return 'ok'
+
+    assert asyncio.run(run_with_deadline(FakeRequest(), loader, timeout=1)) == 'ok'
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from app.shared_snapshot import SharedSnapshot
+
+
+@pytest.fixture
+def shared(monkeypatch, tmp_path):
+    monkeypatch.setenv('SHARED_SNAPSHOT_PATH', str(tmp_path / 'snapshot'))
+    if 'instance' in vars(SharedSnapshot):
+        del SharedSnapshot.instance
+    yield SharedSnapshot()
+    if SharedSnapshot.instance.lock_file is not None:
+        SharedSnapshot.instance.lock_file.close()
+    del SharedSnapshot.instance
+
+
+def test_follower_reads_published_views(shared, service):
+    async def run():
+        await shared.publish(service)
+        snapshot = await service.get_snapshot()
+        height, body = shared.read('tickers')
+        assert height == snapshot.height
+        assert json.loads(body) == jsonable_encoder(await service.get_tickers_view(snapshot, False))
+        assert shared.read('missing') is None
+    asyncio.run(run())
+
+
+def test_leader_does_not_read_its_own_file(shared, service):
+    async def run():
+        await shared.publish(service)
+        assert shared.try_lock()
+        assert shared.read('tickers') is None
+    asyncio.run(run())
+
+
+def test_stale_file_falls_back(shared, service):
+    async def run():
+        await shared.publish(service)
+        assert shared.read('tickers') is not None
+        stale = time.time() - shared.max_age - 1
+        os.utime(shared.path, (stale, stale))
+        assert shared.read('tickers') is None
+    asyncio.run(run())
+
+
+def test_missing_file_falls_back(shared):
+    assert shared.read('tickers') is None
+
+
+def test_leader_releases_lock_after_failed_publishes(shared, monkeypatch, caplog):
+    calls = []
+
+    async def publish(service):
+        calls.append(shared.is_leader)
+        raise RuntimeError('ClickHouse is down')
+
+    monkeypatch.setattr(shared, 'publish', publish)
+    monkeypatch.setattr(SharedSnapshot, 'publish_interval', 0)
+
+    async def run():
+        task = asyncio.ensure_future(shared.run())
+        while len(calls) < shared.max_failures:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.wait([task])
+
+    asyncio.run(run())
+    assert calls == [True] * shared.max_failures
+    assert not shared.is_leader
+    assert not shared.try_lock()
+    assert 'Publishing the shared snapshot failed' in caplog.text
+    shared.lock_retry_at = 0
+    assert shared.try_lock()
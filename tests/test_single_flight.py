@@ -0,0 +1,42 @@
+import asyncio
+
+from common.single_flight import SingleFlight
+
+
+def test_single_flight_shares_one_call():
+    async def run():
+        calls = SingleFlight()
+        started = []
+
+        async def loader():
+            started.append(1)
+            await asyncio.sleep(0.01)
+            return len(started)
+
+        assert await asyncio.gather(*(calls.do('key', loader) for _ in range(5))) == [1] * 5
+        assert await calls.do('key', loader) == 2
+        assert not calls.calls
+    asyncio.run(run())
+
+
+def test_single_flight_cancels_with_its_last_waiter():
+    async def run():
+        calls = SingleFlight()
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return 1
+
+        first = asyncio.ensure_future(calls.do('key', loader))
+        second = asyncio.ensure_future(calls.do('key', loader))
+        await asyncio.sleep(0)
+        future = calls.calls['key']['future']
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not future.cancelled()
+        second.cancel()
+        await asyncio.wait([future])
+        assert future.cancelled()
+        assert not calls.calls
+    asyncio.run(run())
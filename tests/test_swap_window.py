@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_market import SyntheticDBClient
+from services.swap_window import RollingSwapWindow
+
+
+def get_expected_volumes(market, from_height, to_height):
+    swaps = market.swaps
+    result = {}
+    for position in range(*market.get_swap_slice(from_height, to_height)):
+        if not swaps['success'][position]:
+            continue
+        key = (int(swaps['pool_id'][position]), swaps['offer_coin_denom'][position], swaps['demand_coin_denom'][position])
+        offer_volume, demand_volume, count = result.get(key, (0, 0, 0))
+        result[key] = (
+            offer_volume + int(swaps['offer_coin_amount'][position]),
+            demand_volume + int(swaps['exchanged_demand_coin_amount'][position]),
+            count + 1,
+        )
+    return result
+
+
+def get_position(market, height):
+    position = np.searchsorted(market.swaps['height'], height)
+    while not market.swaps['success'][position]:
+        position += 1
+    return position
+
+
+def test_window_expires_old_heights(market):
+    async def run():
+        db_client = SyntheticDBClient(market)
+        window = RollingSwapWindow()
+        await window.sync(db_client, 1000, market.tip)
+        market.advance(100)
+        await window.sync(db_client, 5000, market.tip)
+        assert window.buckets[0][0] > 5000
+        assert window.buckets[-1][0] <= market.tip
+        assert window.volumes == get_expected_volumes(market, 5000, market.tip)
+        assert window.get_swaps_after(market.tip - 50) == [
+            swap for _, swaps in window.buckets for swap in swaps if swap[0] > market.tip - 50
+        ]
+    asyncio.run(run())
+
+
+def test_window_rereads_recent_heights(market):
+    async def run():
+        db_client = SyntheticDBClient(market)
+        window = RollingSwapWindow()
+        await window.sync(db_client, 1000, market.tip)
+        position = get_position(market, market.tip - window.reread_heights // 2)
+        market.swaps['offer_coin_amount'][position] += 10 ** 9
+        market.advance()
+        await window.sync(db_client, 1000, market.tip)
+        assert window.volumes == get_expected_volumes(market, 1000, market.tip)
+    asyncio.run(run())
+
+
+def test_window_reloads_after_reload_interval(market):
+    async def run():
+        db_client = SyntheticDBClient(market)
+        window = RollingSwapWindow()
+        await window.sync(db_client, 1000, market.tip)
+        position = get_position(market, market.tip - 10 * window.reread_heights)
+        market.swaps['offer_coin_amount'][position] += 10 ** 9
+        market.advance()
+        await window.sync(db_client, 1000, market.tip)
+        assert window.volumes != get_expected_volumes(market, 1000, market.tip)
+        window.loaded_at = time.monotonic() - window.reload_interval
+        market.advance()
+        await window.sync(db_client, 1000, market.tip)
+        assert window.volumes == get_expected_volumes(market, 1000, market.tip)
+    asyncio.run(run())
+
+
+def get_expected_statistics(market, from_height, to_height):
+    swaps = market.swaps
+    a_denoms = {pool_id: a_denom for pool_id, a_denom, _ in market.pools}
+    result = {}
+    for position in range(*market.get_swap_slice(from_height, to_height)):
+        pool_id, price = int(swaps['pool_id'][position]), float(swaps['swap_price'][position])
+        item = result.setdefault(pool_id, {
+            'first_price': price, 'lowest_price_24h': price, 'highest_price_24h': price,
+            'base_volume': 0, 'quote_volume': 0, 'highest_bid': 0, 'lowest_ask': 0,
+        })
+        item['last_price'] = price
+        item['lowest_price_24h'] = min(item['lowest_price_24h'], price)
+        item['highest_price_24h'] = max(item['highest_price_24h'], price)
+        if not swaps['success'][position]:
+            continue
+        offer_amount, demand_amount = int(swaps['offer_coin_amount'][position]), int(swaps['exchanged_demand_coin_amount'][position])
+        if swaps['offer_coin_denom'][position] == a_denoms[pool_id]:
+            item['base_volume'] += offer_amount
+            item['quote_volume'] += demand_amount
+            item['highest_bid'] = max(item['highest_bid'], price)
+        else:
+            item['base_volume'] += demand_amount
+            item['quote_volume'] += offer_amount
+            item['lowest_ask'] = min(item['lowest_ask'], price) if item['lowest_ask'] else price
+    return result
+
+
+def test_pool_statistics_follow_the_window(market):
+    async def run():
+        db_client = SyntheticDBClient(market)
+        pools = await db_client.get_base_for_tickers()
+        window = RollingSwapWindow()
+        window_height = market.tip - 14400
+        await window.sync(db_client, window_height, market.tip)
+        assert window.get_pool_statistics(pools) == get_expected_statistics(market, window_height, market.tip)
+        for blocks in [1, 1, 7, 150]:
+            market.advance(blocks)
+            window_height += blocks
+            await window.sync(db_client, window_height, market.tip)
+            assert window.get_pool_statistics(pools) == get_expected_statistics(market, window_height, market.tip)
+        position = get_position(market, market.tip - 5)
+        market.swaps['swap_price'][position] = 10 ** 6
+        market.advance()
+        window_height += 1
+        await window.sync(db_client, window_height, market.tip)
+        assert window.get_pool_statistics(pools) == get_expected_statistics(market, window_height, market.tip)
+    asyncio.run(run())